@@ -5,7 +5,10 @@ Reads/writes config.json, merging saved values over built-in defaults.
 
 import json
 import os
+import hashlib
 import logging
+import tempfile
+import threading
 from typing import Any, Optional
 
 log = logging.getLogger(__name__)
@@ -22,6 +25,7 @@ DEFAULT_CONFIG: dict[str, Any] = {
     "context_window": 4096,
     "max_memory_results": 5,
     "auto_prune_days": 0,
+    "response_cache": True,
     "system_prompt": (
         "You are KOMALAM, a helpful and friendly local AI assistant. "
         "You remember past conversations and use them to provide personalized responses. "
@@ -31,43 +35,113 @@ DEFAULT_CONFIG: dict[str, Any] = {
 
 
 class ConfigManager:
-    """Manages application config with auto-save on every write."""
+    """
+    Manages application config. Writes are debounced: set() marks the config
+    dirty and a short timer persists it, skipping the write entirely when the
+    serialized content matches what is already on disk. config.json is only
+    created once a setting is actually changed, and only read on first access.
+    """
+
+    SAVE_DEBOUNCE_S = 0.5
 
     def __init__(self):
         self._config: dict[str, Any] = {}
-        self.load()
+        # Bound once so a late debounce timer writes where this instance loaded from
+        self._path = CONFIG_FILE
+        self._lock = threading.RLock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._last_hash: Optional[str] = None
+        self._exists_on_disk = False
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
 
-    def load(self):
-        if os.path.exists(CONFIG_FILE):
+    def load(self) -> bool:
+        """Load config.json over the defaults. Returns False when no file exists."""
+        self._loaded = True
+        self._exists_on_disk = os.path.exists(self._path)
+        if self._exists_on_disk:
             try:
-                with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                with open(self._path, "r", encoding="utf-8") as f:
                     saved = json.load(f)
                 # Merge: defaults first, saved values override
                 self._config = {**DEFAULT_CONFIG, **saved}
+                if saved == self._config:
+                    self._last_hash = self._digest(self._serialize())
             except (json.JSONDecodeError, OSError) as exc:
                 log.warning("Config file corrupt, using defaults: %s", exc)
                 self._config = dict(DEFAULT_CONFIG)
         else:
             self._config = dict(DEFAULT_CONFIG)
-            self.save()
+        return self._exists_on_disk
+
+    def _serialize(self) -> str:
+        self._ensure_loaded()
+        with self._lock:
+            return json.dumps(self._config, indent=4)
+
+    @staticmethod
+    def _digest(payload: str) -> str:
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
     def save(self):
+        """Write config.json now (atomically), unless nothing changed."""
+        payload = self._serialize()
+        digest = self._digest(payload)
+        if digest == self._last_hash:
+            return
+
+        config_dir = os.path.dirname(self._path)
         try:
-            with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                json.dump(self._config, f, indent=4)
+            fd, tmp_path = tempfile.mkstemp(dir=config_dir, prefix=".config-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._last_hash = digest
+            self._exists_on_disk = True
         except OSError as exc:
             log.error("Failed to write config: %s", exc)
 
+    def _schedule_save(self):
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+            self._flush_timer = threading.Timer(self.SAVE_DEBOUNCE_S, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Persist any pending change immediately (call on shutdown)."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        self.save()
+
     def get(self, key: str, default: Any = None) -> Any:
+        self._ensure_loaded()
         return self._config.get(key, default)
 
     def set(self, key: str, value: Any):
-        self._config[key] = value
-        self.save()
+        self._ensure_loaded()
+        with self._lock:
+            self._config[key] = value
+        self._schedule_save()
 
     def get_all(self) -> dict[str, Any]:
+        self._ensure_loaded()
         return dict(self._config)
 
     def reset(self):
-        self._config = dict(DEFAULT_CONFIG)
-        self.save()
+        self._ensure_loaded()
+        with self._lock:
+            self._config = dict(DEFAULT_CONFIG)
+        self._schedule_save()
@@ -1,14 +1,26 @@
 """
 KOMALAM Database Layer
 SQLite storage for conversations and messages, with FTS5 full-text search.
+
+Writes are queued and committed by a single writer thread so bursts of small
+mutations share one transaction. Each queued group returns a Future that
+settles once it commits, carrying the error if it failed; failures are
+also passed to ``on_write_error``. Reads go through a small pool of read-only
+connections (WAL lets them run alongside the writer) and flush the queue
+first, so callers always see their own writes.
 """
 
 import sqlite3
 import os
 import uuid
+import queue
 import logging
-from datetime import datetime
-from typing import Optional
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
 
 log = logging.getLogger(__name__)
 
@@ -17,20 +29,162 @@ DATA_DIR = os.path.join(_PROJECT_ROOT, "data")
 DB_PATH = os.path.join(DATA_DIR, "komalam.db")
 
 
+# Timestamps are bound as integer Unix microseconds; the ISO text columns
+# kept for display are rendered by SQLite from the same value.
+def _iso_from_us(param: str) -> str:
+    return (
+        f"strftime('%Y-%m-%dT%H:%M:%S', {param} / 1000000, 'unixepoch', 'localtime')"
+        f" || printf('.%06d', {param} % 1000000)"
+    )
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+# Hot-path statements. Keeping one string object per statement means every
+# call hits sqlite3's per-connection statement cache instead of re-preparing.
+_SQL_INSERT_CONVERSATION = (
+    "INSERT INTO conversations (id, title, created_at, updated_at) "
+    f"VALUES (?1, ?2, {_iso_from_us('?3')}, {_iso_from_us('?3')})"
+)
+# Column list matches idx_conversations_updated so the listing is an index-only scan
+_SQL_LIST_CONVERSATIONS = (
+    "SELECT id, title, created_at, updated_at FROM conversations "
+    "ORDER BY updated_at DESC LIMIT ?"
+)
+_SQL_GET_CONVERSATION = "SELECT * FROM conversations WHERE id = ?"
+_SQL_UPDATE_TITLE = (
+    f"UPDATE conversations SET title = ?1, updated_at = {_iso_from_us('?2')} WHERE id = ?3"
+)
+_SQL_DELETE_CONVERSATION = "DELETE FROM conversations WHERE id = ?"
+_SQL_TOUCH_CONVERSATION = (
+    f"UPDATE conversations SET updated_at = {_iso_from_us('?1')} WHERE id = ?2"
+)
+_SQL_INSERT_MESSAGE = (
+    "INSERT INTO messages "
+    "(id, conversation_id, role, content, timestamp, timestamp_us, embedding_id) "
+    f"VALUES (?1, ?2, ?3, ?4, {_iso_from_us('?5')}, ?5, ?6)"
+)
+_SQL_GET_MESSAGES = (
+    "SELECT * FROM messages WHERE conversation_id = ? ORDER BY timestamp_us ASC, rowid ASC"
+)
+_SQL_ALL_MESSAGES = "SELECT * FROM messages ORDER BY timestamp_us DESC, rowid DESC LIMIT ?"
+_SQL_UPDATE_EMBEDDING = "UPDATE messages SET embedding_id = ? WHERE id = ?"
+_SQL_INSERT_TAG = (
+    f"INSERT INTO memory_tags (message_id, tag, created_at) VALUES (?1, ?2, {_iso_from_us('?3')})"
+)
+_SQL_DELETE_TAG = "DELETE FROM memory_tags WHERE message_id = ? AND tag = ?"
+_SQL_SEARCH_CONVERSATIONS_FTS = """
+    SELECT * FROM conversations
+    WHERE title LIKE ?1 OR id IN (
+        SELECT m.conversation_id FROM messages_fts
+        JOIN messages m ON m.rowid = messages_fts.rowid
+        WHERE messages_fts MATCH ?2
+    )
+    ORDER BY updated_at DESC LIMIT ?3
+"""
+_SQL_SEARCH_CONVERSATIONS_LIKE = """
+    SELECT * FROM conversations
+    WHERE title LIKE ?1 OR id IN (SELECT conversation_id FROM messages WHERE content LIKE ?1)
+    ORDER BY updated_at DESC LIMIT ?2
+"""
+_SQL_PUT_RESPONSE = (
+    "INSERT OR REPLACE INTO response_cache (prompt_hash, response, context_hash, created_at) "
+    f"VALUES (?1, ?2, ?3, {_iso_from_us('?4')})"
+)
+# REPLACE re-inserts, so rowid order is recency; a rowid range keeps at most
+# the newest ?1 rows without sorting the table
+_SQL_TRIM_RESPONSES = (
+    "DELETE FROM response_cache WHERE rowid <= (SELECT max(rowid) FROM response_cache) - ?1"
+)
+_SQL_GET_RESPONSE = "SELECT response, context_hash FROM response_cache WHERE prompt_hash = ?"
+
+
 class Database:
     """SQLite database manager for chat storage and search."""
 
+    # Writer thread lingers this long for more ops before committing a batch
+    FLUSH_INTERVAL_S = 0.05
+    FLUSH_MAX_OPS = 256
+    READ_POOL_SIZE = 4
+    # A reader waits this long for a pooled connection before giving up
+    READ_POOL_TIMEOUT_S = 5.0
+    CACHED_STATEMENTS = 256
+    # Background upkeep: planner stats refresh and early WAL checkpoints
+    MAINTENANCE_INTERVAL_S = 15 * 60
+    CHECKPOINT_EVERY_WRITES = 200
+
     def __init__(self, db_path: str = DB_PATH):
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        # TODO: consider a connection-per-thread pool if we ever go multi-threaded on writes
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self.conn.execute("PRAGMA journal_mode=WAL")
-        self.conn.execute("PRAGMA foreign_keys=ON")
+        self._write_conn = sqlite3.connect(
+            db_path, check_same_thread=False, cached_statements=self.CACHED_STATEMENTS
+        )
+        self._write_conn.row_factory = sqlite3.Row
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        self._write_conn.execute("PRAGMA foreign_keys=ON")
+        self._apply_pragmas(self._write_conn)
+        self._has_fts = False
         self._create_tables()
 
+        # Read-only connections; WAL readers never block the writer
+        read_uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        self._read_pool: queue.LifoQueue = queue.LifoQueue()
+        for _ in range(self.READ_POOL_SIZE):
+            conn = sqlite3.connect(
+                read_uri, uri=True, check_same_thread=False,
+                cached_statements=self.CACHED_STATEMENTS,
+            )
+            conn.row_factory = sqlite3.Row
+            self._apply_pragmas(conn)
+            self._read_pool.put(conn)
+
+        # Guards the write connection (writer thread + maintenance)
+        self._lock = threading.RLock()
+        self._write_queue: queue.Queue = queue.Queue()
+        self._flush_now = threading.Event()
+        # Per-thread statement buffer while a transaction() block is open
+        self._tx = threading.local()
+        # Called on the writer thread with each failed group's exception
+        self.on_write_error: Optional[Callable[[Exception], None]] = None
+        self._writer = threading.Thread(
+            target=self._drain_loop, name="db-writer", daemon=True
+        )
+        self._writer.start()
+
+        self._writes_since_ckpt = 0
+        self._maintenance_timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    @staticmethod
+    def _apply_pragmas(conn: sqlite3.Connection):
+        """Connection tuning. synchronous=NORMAL is durable-safe under WAL."""
+        conn.executescript("""
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA busy_timeout=5000;
+            PRAGMA wal_autocheckpoint=1000;
+        """)
+        # Large mmap/cache sizes can be rejected on 32-bit builds
+        try:
+            conn.executescript("""
+                PRAGMA mmap_size=268435456;
+                PRAGMA cache_size=-65536;
+            """)
+        except sqlite3.DatabaseError as exc:
+            log.debug("mmap/cache pragmas not applied: %s", exc)
+
     def _create_tables(self):
-        self.conn.executescript("""
+        # Older cache tables (the semantic cache's, or one keyed on the whole
+        # context) hold replies without a context fingerprint; it is only a
+        # cache, so drop it
+        cache_columns = {
+            row["name"] for row in self._write_conn.execute("PRAGMA table_info(response_cache)")
+        }
+        if cache_columns and "context_hash" not in cache_columns:
+            self._write_conn.execute("DROP TABLE response_cache")
+
+        self._write_conn.executescript("""
             CREATE TABLE IF NOT EXISTS conversations (
                 id TEXT PRIMARY KEY,
                 title TEXT NOT NULL DEFAULT 'New Chat',
@@ -44,6 +198,7 @@ class Database:
                 role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
                 content TEXT NOT NULL,
                 timestamp TEXT NOT NULL,
+                timestamp_us INTEGER,
                 embedding_id INTEGER DEFAULT -1,
                 FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE
             );
@@ -56,24 +211,275 @@ class Database:
                 FOREIGN KEY (message_id) REFERENCES messages(id) ON DELETE CASCADE
             );
 
-            CREATE INDEX IF NOT EXISTS idx_messages_conv ON messages(conversation_id);
-            CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp);
+            CREATE TABLE IF NOT EXISTS response_cache (
+                prompt_hash TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                context_hash TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+
             CREATE INDEX IF NOT EXISTS idx_memory_tags_tag ON memory_tags(tag);
+            CREATE INDEX IF NOT EXISTS idx_conversations_updated
+                ON conversations(updated_at DESC, id, title, created_at);
         """)
 
-        # FTS5 virtual table for full-text search
+        # Databases created before timestamp_us existed: add and backfill it
+        columns = {row["name"] for row in self._write_conn.execute("PRAGMA table_info(messages)")}
+        if "timestamp_us" not in columns:
+            self._write_conn.executescript("""
+                ALTER TABLE messages ADD COLUMN timestamp_us INTEGER;
+                UPDATE messages SET timestamp_us =
+                    CAST((julianday(timestamp, 'utc') - 2440587.5) * 86400000000 AS INTEGER);
+            """)
+
+        # Integer-keyed indexes; the composite one also serves conversation_id lookups
+        self._write_conn.executescript("""
+            DROP INDEX IF EXISTS idx_messages_conv;
+            DROP INDEX IF EXISTS idx_messages_timestamp;
+            CREATE INDEX IF NOT EXISTS idx_messages_conv_ts ON messages(conversation_id, timestamp_us);
+            CREATE INDEX IF NOT EXISTS idx_messages_ts_us ON messages(timestamp_us);
+        """)
+
+        # FTS5 index over messages.content. External-content: the index stores
+        # postings only and triggers keep it in step with the messages table.
         try:
-            self.conn.execute("""
+            row = self._write_conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+            ).fetchone()
+            legacy = row is not None and "content='messages'" not in row["sql"]
+            if legacy:
+                # Pre-trigger schema kept its own copy of every message
+                self._write_conn.execute("DROP TABLE messages_fts")
+
+            self._write_conn.executescript("""
                 CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
                     content,
+                    content='messages',
                     content_rowid='rowid',
                     tokenize='porter'
                 );
+
+                CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+                    INSERT INTO messages_fts (rowid, content) VALUES (new.rowid, new.content);
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+                    INSERT INTO messages_fts (messages_fts, rowid, content)
+                    VALUES ('delete', old.rowid, old.content);
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF content ON messages BEGIN
+                    INSERT INTO messages_fts (messages_fts, rowid, content)
+                    VALUES ('delete', old.rowid, old.content);
+                    INSERT INTO messages_fts (rowid, content) VALUES (new.rowid, new.content);
+                END;
             """)
+            if row is None or legacy:
+                self._write_conn.execute(
+                    "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"
+                )
+            self._has_fts = True
         except sqlite3.OperationalError:
-            pass  # already exists or FTS5 not compiled in
+            log.debug("FTS5 not available, search will use LIKE")
 
-        self.conn.commit()
+        self._write_conn.commit()
+
+    # ------------------------------------------------------------------ #
+    #  Write queue                                                        #
+    # ------------------------------------------------------------------ #
+
+    def enqueue_write(self, sql: str, params=()) -> Future:
+        """Queue a single statement for the writer thread."""
+        return self._enqueue([(sql, params)])
+
+    def _enqueue(self, statements: list[tuple]) -> Future:
+        """
+        Queue a group of ``(sql, params)`` statements that must commit together.
+        A list of parameter tuples runs the statement through executemany.
+        The returned Future resolves to None on commit or holds the error;
+        inside transaction() it is the transaction's.
+        """
+        pending = getattr(self._tx, "statements", None)
+        if pending is not None:
+            pending.extend(statements)
+            return self._tx.future
+        done: Future = Future()
+        self._write_queue.put((statements, done))
+        return done
+
+    @contextmanager
+    def transaction(self):
+        """
+        Collect the writes this thread issues inside the block into a single
+        group, committed by one BEGIN IMMEDIATE ... COMMIT. If the block
+        raises, nothing is queued. Nested blocks join the outermost one.
+        The block gets the group's Future, as ``with db.transaction() as done``.
+
+        Like every write, the group is only queued on exit; reads inside the
+        block do not see it yet.
+        """
+        if getattr(self._tx, "statements", None) is not None:
+            yield self._tx.future
+            return
+        statements: list[tuple] = []
+        done: Future = Future()
+        self._tx.statements = statements
+        self._tx.future = done
+        try:
+            yield done
+        finally:
+            self._tx.statements = None
+            self._tx.future = None
+        if statements:
+            self._write_queue.put((statements, done))
+        else:
+            done.set_result(None)
+
+    def flush(self):
+        """Block until every queued write has been committed."""
+        if threading.current_thread() is self._writer:
+            return
+        self._flush_now.set()
+        self._write_queue.join()
+
+    def _drain_loop(self):
+        while True:
+            group = self._write_queue.get()
+            if group is None:
+                self._write_queue.task_done()
+                return
+
+            # Linger briefly so a burst of writes shares one commit
+            self._flush_now.wait(self.FLUSH_INTERVAL_S)
+            self._flush_now.clear()
+
+            batch = [group]
+            stop = False
+            while len(batch) < self.FLUSH_MAX_OPS:
+                try:
+                    nxt = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+
+            self._commit_batch(batch)
+            for _ in batch:
+                self._write_queue.task_done()
+
+            # Checkpoint while idle rather than letting autocheckpoint land mid-burst
+            self._writes_since_ckpt += len(batch)
+            if self._writes_since_ckpt >= self.CHECKPOINT_EVERY_WRITES and self._write_queue.empty():
+                self._checkpoint()
+            if stop:
+                self._write_queue.task_done()
+                return
+
+    def _commit_batch(self, batch: list[tuple[list[tuple], Future]]):
+        with self._lock:
+            try:
+                self._write_conn.execute("BEGIN IMMEDIATE")
+                for statements, _ in batch:
+                    for sql, params in statements:
+                        if isinstance(params, list):
+                            self._write_conn.executemany(sql, params)
+                        else:
+                            self._write_conn.execute(sql, params)
+                self._write_conn.commit()
+            except sqlite3.Error as exc:
+                self._write_conn.rollback()
+                if len(batch) == 1:
+                    log.error("Dropped write after error: %s", exc)
+                    batch[0][1].set_exception(exc)
+                    self._report_write_error(exc)
+                    return
+            else:
+                for _, done in batch:
+                    done.set_result(None)
+                return
+
+        # Isolate the failing group so one bad op doesn't sink the whole batch
+        for group in batch:
+            self._commit_batch([group])
+
+    def _report_write_error(self, exc: Exception):
+        handler = self.on_write_error
+        if handler is None:
+            return
+        try:
+            handler(exc)
+        except Exception as handler_exc:  # never let a listener kill the writer
+            log.error("Write error handler failed: %s", handler_exc)
+
+    # ------------------------------------------------------------------ #
+    #  Maintenance                                                        #
+    # ------------------------------------------------------------------ #
+
+    def start_maintenance(self, interval_s: Optional[float] = None):
+        """Run PRAGMA optimize periodically on a background timer."""
+        if self._maintenance_timer is not None:
+            return
+        self._schedule_maintenance(interval_s or self.MAINTENANCE_INTERVAL_S)
+
+    def _schedule_maintenance(self, interval_s: float):
+        self._maintenance_timer = threading.Timer(
+            interval_s, self._run_maintenance, args=(interval_s,)
+        )
+        self._maintenance_timer.daemon = True
+        self._maintenance_timer.start()
+
+    def _run_maintenance(self, interval_s: float):
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self._write_conn.execute("PRAGMA optimize")
+            except sqlite3.Error as exc:
+                log.warning("PRAGMA optimize failed: %s", exc)
+        self._checkpoint()
+        self._schedule_maintenance(interval_s)
+
+    def _checkpoint(self):
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self._write_conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                self._writes_since_ckpt = 0
+            except sqlite3.Error as exc:
+                log.warning("WAL checkpoint failed: %s", exc)
+
+    @contextmanager
+    def _with_read(self):
+        """Borrow a read-only connection from the pool."""
+        self.flush()
+        try:
+            conn = self._read_pool.get(timeout=self.READ_POOL_TIMEOUT_S)
+        except queue.Empty:
+            # Each un-exhausted _iter_query generator holds a connection
+            raise RuntimeError(
+                f"All {self.READ_POOL_SIZE} read connections are in use; "
+                "exhaust or close open row iterators before starting another"
+            ) from None
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+
+    def _query(self, sql: str, params=()) -> list[sqlite3.Row]:
+        with self._with_read() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _iter_query(self, sql: str, params=()) -> Iterator[dict]:
+        """
+        Yield rows as dicts straight off the cursor. The pooled connection
+        is held until the generator is exhausted or closed.
+        """
+        with self._with_read() as conn:
+            for row in conn.execute(sql, params):
+                yield dict(row)
 
     # ------------------------------------------------------------------ #
     #  Conversations                                                      #
@@ -81,89 +487,96 @@ class Database:
 
     def create_conversation(self, title: str = "New Chat") -> str:
         conv_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
-        self.conn.execute(
-            "INSERT INTO conversations (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
-            (conv_id, title, now, now),
-        )
-        self.conn.commit()
+        self.enqueue_write(_SQL_INSERT_CONVERSATION, (conv_id, title, _now_us()))
         return conv_id
 
     def get_conversations(self, limit: int = 50) -> list[dict]:
-        cursor = self.conn.execute(
-            "SELECT * FROM conversations ORDER BY updated_at DESC LIMIT ?",
-            (limit,),
-        )
-        return [dict(row) for row in cursor.fetchall()]
+        return list(self._iter_query(_SQL_LIST_CONVERSATIONS, (limit,)))
 
     def get_conversation(self, conv_id: str) -> Optional[dict]:
-        cursor = self.conn.execute(
-            "SELECT * FROM conversations WHERE id = ?", (conv_id,)
-        )
-        row = cursor.fetchone()
-        return dict(row) if row else None
+        rows = self._query(_SQL_GET_CONVERSATION, (conv_id,))
+        return dict(rows[0]) if rows else None
 
     def update_conversation_title(self, conv_id: str, title: str):
-        now = datetime.now().isoformat()
-        self.conn.execute(
-            "UPDATE conversations SET title = ?, updated_at = ? WHERE id = ?",
-            (title, now, conv_id),
-        )
-        self.conn.commit()
+        self.enqueue_write(_SQL_UPDATE_TITLE, (title, _now_us(), conv_id))
 
     def delete_conversation(self, conv_id: str):
-        self.conn.execute("DELETE FROM conversations WHERE id = ?", (conv_id,))
-        self.conn.commit()
+        self.enqueue_write(_SQL_DELETE_CONVERSATION, (conv_id,))
 
     # ------------------------------------------------------------------ #
     #  Messages                                                           #
     # ------------------------------------------------------------------ #
 
-    def add_message(self, conversation_id: str, role: str, content: str, embedding_id: int = -1) -> str:
-        msg_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
-        self.conn.execute(
-            "INSERT INTO messages (id, conversation_id, role, content, timestamp, embedding_id) "
-            "VALUES (?, ?, ?, ?, ?, ?)",
-            (msg_id, conversation_id, role, content, now, embedding_id),
-        )
-        self.conn.execute(
-            "UPDATE conversations SET updated_at = ? WHERE id = ?",
-            (now, conversation_id),
-        )
+    def add_message(
+        self, conversation_id: str, role: str, content: str,
+        embedding_id: int = -1, msg_id: Optional[str] = None,
+    ) -> str:
+        """
+        Insert a message and bump its conversation. Pass *msg_id* when the id
+        has to be known before the insert (e.g. to embed first and store the
+        embedding id in the same row).
+        """
+        msg_id = msg_id or str(uuid.uuid4())
+        now = _now_us()
+        # One transaction for the message and the conversation bump
+        # (the FTS row is written by the messages_ai trigger)
+        statements = [
+            (_SQL_INSERT_MESSAGE, (msg_id, conversation_id, role, content, now, embedding_id)),
+            (_SQL_TOUCH_CONVERSATION, (now, conversation_id)),
+        ]
+        self._enqueue(statements)
+        return msg_id
 
-        # Keep FTS index in sync
-        try:
-            self.conn.execute(
-                "INSERT INTO messages_fts (rowid, content) VALUES (last_insert_rowid(), ?)",
-                (content,),
-            )
-        except sqlite3.OperationalError:
-            log.debug("FTS insert skipped (table may not exist)")
+    def add_messages_bulk(self, rows: Iterable[tuple]) -> list[str]:
+        """
+        Insert many messages in a single transaction.
 
-        self.conn.commit()
-        return msg_id
+        *rows* yields ``(conversation_id, role, content)`` or
+        ``(conversation_id, role, content, embedding_id)`` tuples.
+        Returns the new message ids in input order.
+        """
+        now = _now_us()
+        params = []
+        for row in rows:
+            conversation_id, role, content = row[:3]
+            embedding_id = row[3] if len(row) > 3 else -1
+            params.append((str(uuid.uuid4()), conversation_id, role, content, now, embedding_id))
+        if not params:
+            return []
+
+        msg_ids = [p[0] for p in params]
+        conv_ids = {p[1] for p in params}
+        statements = [
+            (_SQL_INSERT_MESSAGE, params),
+            (_SQL_TOUCH_CONVERSATION, [(now, conv_id) for conv_id in conv_ids]),
+        ]
+        self._enqueue(statements)
+        return msg_ids
+
+    def iter_messages(self, conversation_id: str) -> Iterator[dict]:
+        return self._iter_query(_SQL_GET_MESSAGES, (conversation_id,))
 
     def get_messages(self, conversation_id: str) -> list[dict]:
-        cursor = self.conn.execute(
-            "SELECT * FROM messages WHERE conversation_id = ? ORDER BY timestamp ASC",
-            (conversation_id,),
-        )
-        return [dict(row) for row in cursor.fetchall()]
+        return list(self.iter_messages(conversation_id))
 
-    def get_all_messages(self, limit: int = 1000) -> list[dict]:
+    def iter_all_messages(self, limit: int = 1000) -> Iterator[dict]:
         """All messages across conversations (used for bulk memory re-indexing)."""
-        cursor = self.conn.execute(
-            "SELECT * FROM messages ORDER BY timestamp DESC LIMIT ?", (limit,)
-        )
-        return [dict(row) for row in cursor.fetchall()]
+        return self._iter_query(_SQL_ALL_MESSAGES, (limit,))
+
+    def get_all_messages(self, limit: int = 1000) -> list[dict]:
+        return list(self.iter_all_messages(limit))
 
     def update_message_embedding(self, msg_id: str, embedding_id: int):
-        self.conn.execute(
-            "UPDATE messages SET embedding_id = ? WHERE id = ?",
-            (embedding_id, msg_id),
-        )
-        self.conn.commit()
+        self.enqueue_write(_SQL_UPDATE_EMBEDDING, (embedding_id, msg_id))
+
+    def update_message_embeddings_bulk(self, pairs: Iterable[tuple[int, str]]):
+        """
+        Set many embedding ids in one transaction, e.g. after re-indexing
+        the rows from get_all_messages. *pairs* yields ``(embedding_id, msg_id)``.
+        """
+        params = list(pairs)
+        if params:
+            self._enqueue([(_SQL_UPDATE_EMBEDDING, params)])
 
     # ------------------------------------------------------------------ #
     #  Search                                                             #
@@ -175,7 +588,7 @@ class Database:
         """
         # Try FTS5 first — much faster on larger datasets
         try:
-            cursor = self.conn.execute(
+            rows = list(self._iter_query(
                 """
                 SELECT m.*, c.title as conversation_title
                 FROM messages_fts fts
@@ -186,95 +599,132 @@ class Database:
                 LIMIT ?
                 """,
                 (query, limit),
-            )
-            results = [dict(row) for row in cursor.fetchall()]
-            if results:
-                return results
+            ))
+            if rows:
+                return rows
         except sqlite3.OperationalError:
             pass  # FTS5 table missing or query syntax issue
 
         # Fallback: plain LIKE
-        cursor = self.conn.execute(
+        return list(self._iter_query(
             """
             SELECT m.*, c.title as conversation_title
             FROM messages m
             JOIN conversations c ON m.conversation_id = c.id
             WHERE m.content LIKE ?
-            ORDER BY m.timestamp DESC
+            ORDER BY m.timestamp_us DESC
             LIMIT ?
             """,
             (f"%{query}%", limit),
-        )
-        return [dict(row) for row in cursor.fetchall()]
+        ))
 
     def search_conversations(self, query: str, limit: int = 20) -> list[dict]:
-        cursor = self.conn.execute(
-            """
-            SELECT DISTINCT c.*
-            FROM conversations c
-            LEFT JOIN messages m ON c.id = m.conversation_id
-            WHERE c.title LIKE ? OR m.content LIKE ?
-            ORDER BY c.updated_at DESC
-            LIMIT ?
-            """,
-            (f"%{query}%", f"%{query}%", limit),
-        )
-        return [dict(row) for row in cursor.fetchall()]
+        """
+        Conversations whose title contains *query* or whose messages match it.
+        Titles use LIKE (small table); message content goes through FTS5.
+        One statement, so the LIMIT bounds the work rather than a Python-side
+        id list that a short prefix can grow to every conversation.
+        """
+        like = f"%{query}%"
+        match = self._fts_query(query)
+        if self._has_fts and match:
+            try:
+                rows = self._query(_SQL_SEARCH_CONVERSATIONS_FTS, (like, match, limit))
+                return [dict(row) for row in rows]
+            except sqlite3.OperationalError as exc:
+                log.debug("FTS conversation search failed, using LIKE: %s", exc)
+        return [dict(row) for row in self._query(_SQL_SEARCH_CONVERSATIONS_LIKE, (like, limit))]
+
+    @staticmethod
+    def _fts_query(text: str) -> str:
+        """
+        Turn free-form search-box input into a safe FTS5 query: every term is
+        quoted (so punctuation can't break MATCH syntax) and prefix-matched.
+        """
+        terms = text.split()
+        return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
 
     # ------------------------------------------------------------------ #
     #  Memory Tags                                                        #
     # ------------------------------------------------------------------ #
 
     def add_tag(self, message_id: str, tag: str):
-        now = datetime.now().isoformat()
-        self.conn.execute(
-            "INSERT INTO memory_tags (message_id, tag, created_at) VALUES (?, ?, ?)",
-            (message_id, tag, now),
-        )
-        self.conn.commit()
+        self.enqueue_write(_SQL_INSERT_TAG, (message_id, tag, _now_us()))
 
     def remove_tag(self, message_id: str, tag: str):
-        self.conn.execute(
-            "DELETE FROM memory_tags WHERE message_id = ? AND tag = ?",
-            (message_id, tag),
-        )
-        self.conn.commit()
+        self.enqueue_write(_SQL_DELETE_TAG, (message_id, tag))
 
-    def get_tagged_messages(self, tag: Optional[str] = None) -> list[dict]:
+    def iter_tagged_messages(self, tag: Optional[str] = None) -> Iterator[dict]:
         if tag:
-            cursor = self.conn.execute(
+            return self._iter_query(
                 """
                 SELECT m.*, mt.tag FROM messages m
                 JOIN memory_tags mt ON m.id = mt.message_id
                 WHERE mt.tag = ?
-                ORDER BY m.timestamp DESC
+                ORDER BY m.timestamp_us DESC
                 """,
                 (tag,),
             )
-        else:
-            cursor = self.conn.execute(
-                """
-                SELECT m.*, mt.tag FROM messages m
-                JOIN memory_tags mt ON m.id = mt.message_id
-                ORDER BY m.timestamp DESC
-                """
-            )
-        return [dict(row) for row in cursor.fetchall()]
+        return self._iter_query(
+            """
+            SELECT m.*, mt.tag FROM messages m
+            JOIN memory_tags mt ON m.id = mt.message_id
+            ORDER BY m.timestamp_us DESC
+            """
+        )
+
+    def get_tagged_messages(self, tag: Optional[str] = None) -> list[dict]:
+        return list(self.iter_tagged_messages(tag))
 
     def get_all_tags(self) -> list[str]:
-        cursor = self.conn.execute("SELECT DISTINCT tag FROM memory_tags ORDER BY tag")
-        return [row["tag"] for row in cursor.fetchall()]
+        rows = self._query("SELECT DISTINCT tag FROM memory_tags ORDER BY tag")
+        return [row["tag"] for row in rows]
+
+    # ------------------------------------------------------------------ #
+    #  Response cache                                                     #
+    # ------------------------------------------------------------------ #
+
+    def put_cached_response(
+        self, prompt_hash: str, response: str, context_hash: str, max_entries: int,
+    ):
+        """Store a generated reply, keeping at most the newest *max_entries*."""
+        self._enqueue([
+            (_SQL_PUT_RESPONSE, (prompt_hash, response, context_hash, _now_us())),
+            (_SQL_TRIM_RESPONSES, (max_entries,)),
+        ])
+
+    def get_cached_response(self, prompt_hash: str) -> Optional[tuple[str, str]]:
+        """``(response, context_hash)`` stored for *prompt_hash*, or None."""
+        rows = self._query(_SQL_GET_RESPONSE, (prompt_hash,))
+        return (rows[0]["response"], rows[0]["context_hash"]) if rows else None
+
+    def clear_response_cache(self):
+        self.enqueue_write("DELETE FROM response_cache")
 
     # ------------------------------------------------------------------ #
     #  Helpers                                                            #
     # ------------------------------------------------------------------ #
 
-    def auto_title_conversation(self, conv_id: str, first_message: str):
-        """Set the conversation title from the first user message (truncated)."""
+    def auto_title_conversation(self, conv_id: str, first_message: str) -> str:
+        """Set the conversation title from the first user message (truncated); returns it."""
         title = first_message[:60].strip()
         if len(first_message) > 60:
             title += "…"
         self.update_conversation_title(conv_id, title)
+        return title
 
     def close(self):
-        self.conn.close()
+        if self._maintenance_timer is not None:
+            self._maintenance_timer.cancel()
+        # Sentinel stops the writer once everything queued ahead of it is committed
+        self._write_queue.put(None)
+        self._writer.join()
+        with self._lock:
+            self._closed = True
+            try:
+                self._write_conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            while not self._read_pool.empty():
+                self._read_pool.get_nowait().close()
+            self._write_conn.close()
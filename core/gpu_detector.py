@@ -12,16 +12,62 @@ from typing import Optional
 
 log = logging.getLogger(__name__)
 
+try:
+    import pynvml  # provided by nvidia-ml-py
+except ImportError:
+    pynvml = None
+
+try:
+    import win32com.client  # pywin32, Windows only
+except ImportError:
+    win32com = None
+
 # Suppress console window flash on Windows
 _NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
 
 
+def _nvml_str(value) -> str:
+    # Older pynvml releases return bytes
+    return value.decode() if isinstance(value, bytes) else value
+
+
 class GPUDetector:
     def __init__(self):
+        # Nothing is probed here; detect() runs once the window is up
         self._info: Optional[dict] = None
+        self._nvidia_smi_missing = False
+        self._nvml_handle = None
+        self._nvml_tried = False
+
+    def _init_nvml(self):
+        # NVML handle held for the app lifetime — the same library nvidia-smi
+        # uses, minus a process spawn per query
+        if self._nvml_tried or pynvml is None:
+            return
+        self._nvml_tried = True
+        try:
+            pynvml.nvmlInit()
+            self._nvml_handle = pynvml.nvmlDeviceGetHandleByIndex(0)
+        except Exception as exc:  # NVMLError subclasses, missing driver DLL
+            log.debug("NVML unavailable, falling back to nvidia-smi: %s", exc)
+
+    def shutdown(self):
+        """Release NVML; call once at exit."""
+        if not self._nvml_tried or pynvml is None:
+            return
+        self._nvml_handle = None
+        try:
+            pynvml.nvmlShutdown()
+        except Exception as exc:
+            log.debug("NVML shutdown failed: %s", exc)
+
+    @property
+    def is_detected(self) -> bool:
+        return self._info is not None
 
     def detect(self) -> dict:
         """Run detection and cache the result."""
+        self._init_nvml()
         self._info = {
             "gpus": [],
             "recommended_backend": "cpu",
@@ -43,7 +89,24 @@ class GPUDetector:
         return self._info
 
     def _detect_nvidia(self) -> Optional[dict]:
-        """Query nvidia-smi for GPU details."""
+        """Query NVML (or nvidia-smi) for GPU details."""
+        if self._nvml_handle is not None:
+            try:
+                h = self._nvml_handle
+                return {
+                    "name": _nvml_str(pynvml.nvmlDeviceGetName(h)),
+                    "type": "NVIDIA",
+                    "vram_mb": pynvml.nvmlDeviceGetMemoryInfo(h).total // (1024 * 1024),
+                    "driver": _nvml_str(pynvml.nvmlSystemGetDriverVersion()),
+                    "temperature_c": pynvml.nvmlDeviceGetTemperature(h, pynvml.NVML_TEMPERATURE_GPU),
+                    "utilization_pct": pynvml.nvmlDeviceGetUtilizationRates(h).gpu,
+                    "backend": "CUDA",
+                }
+            except Exception as exc:
+                log.warning("NVML query failed, trying nvidia-smi: %s", exc)
+
+        if self._nvidia_smi_missing:
+            return None
         try:
             result = subprocess.run(
                 [
@@ -73,7 +136,8 @@ class GPUDetector:
                 "backend": "CUDA",
             }
         except FileNotFoundError:
-            return None  # nvidia-smi not installed
+            self._nvidia_smi_missing = True  # not installed; don't probe again
+            return None
         except subprocess.TimeoutExpired:
             log.warning("nvidia-smi timed out")
             return None
@@ -83,6 +147,23 @@ class GPUDetector:
 
     def _detect_amd(self) -> Optional[dict]:
         """Detect AMD GPU via WMI (Windows only)."""
+        if win32com is not None:
+            try:
+                return self._detect_amd_com()
+            except Exception as exc:  # pywintypes.com_error, COM not initialised
+                log.debug("In-process WMI query failed, trying PowerShell: %s", exc)
+        return self._detect_amd_powershell()
+
+    def _detect_amd_com(self) -> Optional[dict]:
+        """Query Win32_VideoController in-process, skipping the PowerShell boot."""
+        wmi = win32com.client.GetObject("winmgmts:")
+        for controller in wmi.InstancesOf("Win32_VideoController"):
+            name = controller.Name or ""
+            if "amd" in name.lower() or "radeon" in name.lower():
+                return self._amd_entry(name, controller.AdapterRAM, controller.DriverVersion)
+        return None
+
+    def _detect_amd_powershell(self) -> Optional[dict]:
         try:
             result = subprocess.run(
                 [
@@ -105,16 +186,11 @@ class GPUDetector:
             if not data:
                 return None
 
-            vram_bytes = data.get("AdapterRAM", 0)
-            return {
-                "name": data.get("Name", "AMD GPU"),
-                "type": "AMD",
-                "vram_mb": int(vram_bytes / (1024 * 1024)) if vram_bytes else 0,
-                "driver": data.get("DriverVersion", "Unknown"),
-                "temperature_c": -1,   # not available via WMI
-                "utilization_pct": -1,
-                "backend": "DirectML",
-            }
+            return self._amd_entry(
+                data.get("Name", "AMD GPU"),
+                data.get("AdapterRAM", 0),
+                data.get("DriverVersion", "Unknown"),
+            )
         except FileNotFoundError:
             return None
         except subprocess.TimeoutExpired:
@@ -124,6 +200,20 @@ class GPUDetector:
             log.debug("AMD detection failed: %s", exc)
             return None
 
+    @staticmethod
+    def _amd_entry(name: str, vram_bytes: Optional[int], driver: Optional[str]) -> dict:
+        if vram_bytes and vram_bytes < 0:
+            vram_bytes &= 0xFFFFFFFF  # AdapterRAM is a uint32 that COM may hand back signed
+        return {
+            "name": name or "AMD GPU",
+            "type": "AMD",
+            "vram_mb": int(vram_bytes / (1024 * 1024)) if vram_bytes else 0,
+            "driver": driver or "Unknown",
+            "temperature_c": -1,   # not available via WMI
+            "utilization_pct": -1,
+            "backend": "DirectML",
+        }
+
     def get_gpu_info(self) -> dict:
         if self._info is None:
             self.detect()
@@ -149,6 +239,22 @@ class GPUDetector:
 
     def get_live_nvidia_stats(self) -> Optional[dict]:
         """Real-time stats for the resource monitor status bar widget."""
+        self._init_nvml()
+        if self._nvml_handle is not None:
+            try:
+                h = self._nvml_handle
+                mem = pynvml.nvmlDeviceGetMemoryInfo(h)
+                return {
+                    "utilization_pct": pynvml.nvmlDeviceGetUtilizationRates(h).gpu,
+                    "memory_used_mb": mem.used // (1024 * 1024),
+                    "memory_total_mb": mem.total // (1024 * 1024),
+                    "temperature_c": pynvml.nvmlDeviceGetTemperature(h, pynvml.NVML_TEMPERATURE_GPU),
+                }
+            except Exception:
+                return None
+
+        if self._nvidia_smi_missing:
+            return None
         try:
             result = subprocess.run(
                 [
@@ -173,5 +279,8 @@ class GPUDetector:
                 "memory_total_mb": int(parts[2].strip()),
                 "temperature_c": int(parts[3].strip()),
             }
-        except (FileNotFoundError, subprocess.TimeoutExpired, ValueError):
+        except FileNotFoundError:
+            self._nvidia_smi_missing = True
+            return None
+        except (subprocess.TimeoutExpired, ValueError):
             return None
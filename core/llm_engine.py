@@ -3,33 +3,120 @@ KOMALAM LLM Engine
 Wraps the Ollama Python client for local inference with streaming support.
 """
 
-import re
+import asyncio
+import json
+import os
 import subprocess
+import threading
 import time
 import logging
-from typing import Optional, Iterator
+from typing import AsyncIterator, Optional, Iterator
+from urllib.parse import urlsplit
 
 from PyQt5.QtCore import QThread, pyqtSignal
 
-log = logging.getLogger(__name__)
-
 try:
-    import ollama
+    import orjson
 except ImportError:
-    ollama = None
+    orjson = None
+
+log = logging.getLogger(__name__)
 
-# Regex compiled once for stripping <think> blocks from Qwen3-style responses
-_THINK_RE = re.compile(r"<think>.*?</think>", re.DOTALL)
+_loads = orjson.loads if orjson is not None else json.loads
+
+# Lazy-loaded on connect(): the client pulls in httpx and pydantic, which
+# would otherwise sit on the path to the first window paint
+ollama = None
+httpx = None
+
+
+def _load_client() -> bool:
+    """Import the ollama client; False if the package is missing."""
+    global ollama, httpx
+    if ollama is None:
+        try:
+            import ollama as _ollama
+        except ImportError:
+            return False
+        ollama = _ollama
+    if httpx is None:
+        try:
+            import httpx as _httpx
+        except ImportError:
+            pass
+        else:
+            httpx = _httpx
+    return True
+
+
+def _ollama_base_url() -> str:
+    """The server URL from OLLAMA_HOST, filled out the way the ollama client does."""
+    host = os.environ.get("OLLAMA_HOST", "").strip() or "127.0.0.1:11434"
+    if "://" in host:
+        # An explicit scheme keeps its own default port
+        parts = urlsplit(host)
+        netloc = parts.netloc
+    else:
+        parts = urlsplit("http://" + host)
+        netloc = parts.netloc if parts.port else f"{parts.hostname}:11434"
+    return f"{parts.scheme}://{netloc}{parts.path.rstrip('/')}"
+
+
+# Markers delimiting Qwen3-style <think> reasoning blocks
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+_TAG_TAIL = len(_THINK_CLOSE) - 1
+
+# Model families known to emit <think> blocks; anything else streams unfiltered
+REASONING_MODELS = {"qwen", "qwq", "deepseek-r1", "r1"}
+
+
+def _strip_think(text: str) -> str:
+    """Remove every complete <think>…</think> block from *text*."""
+    parts = []
+    pos = 0
+    while True:
+        start = text.find(_THINK_OPEN, pos)
+        if start < 0:
+            break
+        end = text.find(_THINK_CLOSE, start + len(_THINK_OPEN))
+        if end < 0:
+            break
+        parts.append(text[pos:start])
+        pos = end + len(_THINK_CLOSE)
+    if not parts:
+        return text.strip()
+    parts.append(text[pos:])
+    return "".join(parts).strip()
+
+
+def _partial_tag_len(text: str, tag: str) -> int:
+    """Length of the longest end of *text* that could begin a split *tag*."""
+    # A tag prefix starts with its only "<", so the last one decides
+    lt = text.rfind("<", max(0, len(text) - len(tag) + 1))
+    return len(text) - lt if lt >= 0 and tag.startswith(text[lt:]) else 0
 
 
 class OllamaEngine:
     """Interface to the local Ollama LLM service."""
 
+    MODELS_CACHE_TTL_S = 10.0
+    STARTUP_POLL_ATTEMPTS = 30
+    STARTUP_POLL_INTERVAL_S = 0.1
+    # Keep-alive pool shared by streaming requests on the generation loop
+    ASYNC_POOL_SIZE = 4
+
     def __init__(self):
         self._model = "llama3.2"
         self._client = None
+        # Created on, and bound to, the GenerateWorker event loop: our own
+        # httpx pool for streaming, or the ollama client when httpx is missing
+        self._http = None
+        self._async_client = None
         self._connected = False
         self._options = {"num_ctx": 4096}
+        self._models_cache: Optional[list[dict]] = None
+        self._models_cache_at: float = 0.0
 
     def set_options(self, context_window: int = 4096, temperature: float = 0.7):
         self._options = {
@@ -38,13 +125,13 @@ class OllamaEngine:
         }
 
     def connect(self) -> bool:
-        if ollama is None:
+        if not _load_client():
             raise RuntimeError("ollama package not installed — run: pip install ollama")
 
+        self._client = ollama.Client()
         try:
-            self._client = ollama.Client()
             self._client.list()
-            self._connected = True
+            self._mark_connected()
             return True
         except Exception:
             pass
@@ -57,27 +144,49 @@ class OllamaEngine:
                 stderr=subprocess.DEVNULL,
                 creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
             )
-            time.sleep(3)
-            self._client = ollama.Client()
-            self._client.list()
-            self._connected = True
-            return True
         except FileNotFoundError:
             self._connected = False
             raise RuntimeError(
                 "Ollama binary not found. Install it from https://ollama.com"
             )
-        except Exception as exc:
-            self._connected = False
-            raise RuntimeError(f"Cannot connect to Ollama: {exc}")
+
+        # Poll until the server answers instead of sleeping a fixed interval
+        last_exc: Optional[Exception] = None
+        for _ in range(self.STARTUP_POLL_ATTEMPTS):
+            try:
+                self._client.list()
+                self._mark_connected()
+                return True
+            except Exception as exc:
+                last_exc = exc
+                time.sleep(self.STARTUP_POLL_INTERVAL_S)
+
+        self._connected = False
+        timeout = self.STARTUP_POLL_ATTEMPTS * self.STARTUP_POLL_INTERVAL_S
+        raise RuntimeError(
+            f"Cannot connect to Ollama: server not ready after {timeout:.0f}s ({last_exc})"
+        )
+
+    def _mark_connected(self):
+        self._connected = True
+        self.invalidate_models()
 
     @property
     def is_connected(self) -> bool:
         return self._connected
 
+    def invalidate_models(self):
+        """Drop the cached model list (call after pulling or removing a model)."""
+        self._models_cache = None
+
     def list_models(self) -> list[dict]:
         if not self._connected:
             return []
+        if (
+            self._models_cache is not None
+            and time.monotonic() - self._models_cache_at < self.MODELS_CACHE_TTL_S
+        ):
+            return [dict(m) for m in self._models_cache]
         try:
             response = self._client.list()
             models = []
@@ -89,7 +198,9 @@ class OllamaEngine:
                     "size": f"{size_gb}GB",
                     "modified": str(model.modified_at) if model.modified_at else "",
                 })
-            return models
+            self._models_cache = models
+            self._models_cache_at = time.monotonic()
+            return [dict(m) for m in models]
         except Exception as exc:
             log.warning("Failed to list models: %s", exc)
             return []
@@ -126,7 +237,8 @@ class OllamaEngine:
                 messages=messages,
                 options=self._options,
             )
-            return response.message.content if response.message else ""
+            content = response.message.content if response.message else ""
+            return _strip_think(content) or content.strip()
         except Exception as exc:
             raise RuntimeError(f"Generation failed: {exc}")
 
@@ -143,72 +255,266 @@ class OllamaEngine:
             options=self._options,
         )
 
+    async def astream_chat(
+        self, prompt: str, context: str = "", system_prompt: str = ""
+    ) -> AsyncIterator[str]:
+        """
+        Async counterpart of stream_chat yielding content tokens; must run on
+        the generation event loop. Streams /api/chat over the engine's own
+        keep-alive httpx pool and parses each NDJSON line with orjson, skipping
+        the per-chunk response models the ollama client would build.
+        """
+        if not self._connected:
+            raise RuntimeError("Not connected to Ollama")
+
+        messages = self._build_messages(prompt, context, system_prompt)
+        if httpx is None:
+            if self._async_client is None:
+                self._async_client = ollama.AsyncClient()
+            return self._client_tokens(messages)
+
+        if self._http is None:
+            # No timeout, like the ollama client: a reply can stream for minutes
+            self._http = httpx.AsyncClient(
+                base_url=_ollama_base_url(),
+                timeout=None,
+                limits=httpx.Limits(
+                    max_connections=self.ASYNC_POOL_SIZE,
+                    max_keepalive_connections=self.ASYNC_POOL_SIZE,
+                ),
+            )
+        payload = {
+            "model": self._model,
+            "messages": messages,
+            "stream": True,
+            "options": self._options,
+        }
+        return self._stream_tokens(self._http, payload)
+
+    @staticmethod
+    async def _stream_tokens(http, payload: dict) -> AsyncIterator[str]:
+        async with http.stream("POST", "/api/chat", json=payload) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                try:
+                    error = _loads(body).get("error") or body.decode(errors="replace")
+                except ValueError:
+                    error = body.decode(errors="replace")
+                raise RuntimeError(f"Ollama error {response.status_code}: {error}")
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                part = _loads(line)
+                if "error" in part:
+                    raise RuntimeError(part["error"])
+                token = (part.get("message") or {}).get("content")
+                if token:
+                    yield token
+
+    async def _client_tokens(self, messages: list[dict]) -> AsyncIterator[str]:
+        stream = await self._async_client.chat(
+            model=self._model,
+            messages=messages,
+            stream=True,
+            options=self._options,
+        )
+        async for chunk in stream:
+            token = chunk.message.content if chunk.message else ""
+            if token:
+                yield token
+
+    async def aclose(self):
+        """Close the streaming connection pool."""
+        http, self._http = self._http, None
+        # ollama.AsyncClient (the fallback) has no public close; drop it
+        self._async_client = None
+        if http is not None:
+            await http.aclose()
+
 
 class GenerateWorker(QThread):
     """
-    Background thread for streaming LLM responses.
-    Handles Qwen3-style <think>…</think> reasoning blocks.
+    Long-lived thread running an asyncio event loop; each submit() streams
+    one reply on it, reusing the same keep-alive HTTP connections.
+    Handles Qwen3-style <think>…</think> reasoning blocks for models in
+    REASONING_MODELS; other models stream through a plain pass-through loop.
+    Signals are emitted from the loop thread and queued to their receivers;
+    tokens are batched so at most one token_received crosses per
+    TOKEN_BATCH_S.
     """
 
+    # ~30 updates a second is smooth to read at a fraction of the signal traffic
+    TOKEN_BATCH_S = 0.033
+
     token_received = pyqtSignal(str)
     thinking_started = pyqtSignal()
     thinking_finished = pyqtSignal()
     generation_complete = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, engine: OllamaEngine, prompt: str, context: str = "", system_prompt: str = ""):
+    def __init__(self, engine: OllamaEngine):
         super().__init__()
         self.engine = engine
-        self.prompt = prompt
-        self.context = context
-        self.system_prompt = system_prompt
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_ready = threading.Event()
+        # Replies are streamed one at a time, in submission order
+        self._turn_lock: Optional[asyncio.Lock] = None
+        # The reply holding _turn_lock; only touched on the event loop
+        self._running: Optional[asyncio.Task] = None
+        self._token_buf: list[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
 
     def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._turn_lock = asyncio.Lock()
+        self._loop_ready.set()
         try:
-            stream = self.engine.stream_chat(
-                self.prompt, self.context, self.system_prompt
-            )
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self.engine.aclose())
+            loop.close()
+
+    def submit(self, prompt: str, context: str = "", system_prompt: str = ""):
+        """
+        Queue a reply to *prompt*; results arrive via the signals. A submit
+        made while another reply is streaming waits for it to finish.
+        """
+        self._loop_ready.wait()
+        asyncio.run_coroutine_threadsafe(
+            self._generate(prompt, context, system_prompt), self._loop
+        )
+
+    def cancel(self):
+        """Abandon the reply currently streaming, if any; queued ones still run."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._cancel_running)
+
+    def _cancel_running(self):
+        if self._running is not None:
+            self._running.cancel()
+
+    def stop(self, timeout_ms: int = 2000):
+        """Cancel any running reply, close the HTTP pool and end the thread."""
+        self.cancel()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self.wait(timeout_ms)
+
+    async def _generate(self, prompt: str, context: str, system_prompt: str):
+        async with self._turn_lock:
+            self._running = asyncio.current_task()
+            try:
+                await self._generate_one(prompt, context, system_prompt)
+            finally:
+                self._running = None
+
+    async def _generate_one(self, prompt: str, context: str, system_prompt: str):
+        model = self.engine.current_model.lower()
+        needs_think_filter = any(name in model for name in REASONING_MODELS)
+        try:
+            stream = await self.engine.astream_chat(prompt, context, system_prompt)
         except RuntimeError as exc:
             self.error_occurred.emit(str(exc))
             return
 
-        raw_stream = ""
+        try:
+            if needs_think_filter:
+                text = await self._stream_filtered(stream)
+            else:
+                text = await self._stream_plain(stream)
+        except asyncio.CancelledError:
+            self._token_buf.clear()
+            self._flush_tokens()
+            raise
+        except Exception as exc:
+            self._flush_tokens()
+            self.error_occurred.emit(str(exc))
+            return
+
+        self._flush_tokens()
+        self.generation_complete.emit(text)
+
+    def _queue_token(self, token: str):
+        """Buffer *token*; the batch goes out when the flush timer fires."""
+        self._token_buf.append(token)
+        if self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.TOKEN_BATCH_S, self._flush_tokens)
+
+    def _flush_tokens(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._token_buf:
+            text = "".join(self._token_buf)
+            self._token_buf.clear()
+            self.token_received.emit(text)
+
+    async def _stream_plain(self, stream) -> str:
+        """Forward every token as-is; used for models without reasoning blocks."""
+        chunks: list[str] = []
+        async for token in stream:
+            chunks.append(token)
+            self._queue_token(token)
+        return "".join(chunks).strip()
+
+    async def _stream_filtered(self, stream) -> str:
+        """Forward tokens while hiding <think> blocks; return the visible text."""
+        raw_chunks: list[str] = []
+        # Visible text is collected as it streams, so think blocks never need
+        # a second pass over the finished message
+        clean_chunks: list[str] = []
+        # Tags can straddle chunk boundaries. Outside a block, visible text
+        # that could start a split <think> is held back until the next token
+        # settles it; inside one, the end of the block so far is kept to
+        # complete a split </think>
+        held = ""
+        tail = ""
         in_think = False
         think_notified = False
 
-        try:
-            for chunk in stream:
-                token = chunk.message.content if chunk.message else ""
-                if not token:
-                    continue
+        def show(text: str):
+            if text:
+                clean_chunks.append(text)
+                self._queue_token(text)
 
-                raw_stream += token
-
-                # Detect <think> opening
-                if "<think>" in raw_stream and not in_think:
-                    in_think = True
+        async for token in stream:
+            raw_chunks.append(token)
+            text = token
+            while text:
+                if in_think:
+                    # Detect </think> closing
+                    scan = tail + text
+                    end = scan.find(_THINK_CLOSE)
+                    if end < 0:
+                        tail = scan[-_TAG_TAIL:]
+                        break
+                    in_think = False
+                    tail = ""
                     if not think_notified:
-                        self.thinking_started.emit()
+                        self.thinking_finished.emit()
                         think_notified = True
-
-                # Detect </think> closing
-                if "</think>" in raw_stream and in_think:
-                    in_think = False
-                    self.thinking_finished.emit()
-                    after = raw_stream.split("</think>", 1)[-1]
-                    if after.strip():
-                        self.token_received.emit(after.strip())
+                    text = scan[end + len(_THINK_CLOSE):].lstrip()
                     continue
 
-                if in_think:
-                    continue
-
-                self.token_received.emit(token)
-
-        except Exception as exc:
-            self.error_occurred.emit(str(exc))
-            return
-
-        # Strip think blocks for storage
-        clean = _THINK_RE.sub("", raw_stream).strip()
-        self.generation_complete.emit(clean or raw_stream.strip())
+                # Detect <think> opening
+                scan = held + text
+                start = scan.find(_THINK_OPEN)
+                if start < 0:
+                    cut = len(scan) - _partial_tag_len(scan, _THINK_OPEN)
+                    show(scan[:cut])
+                    held = scan[cut:]
+                    break
+                show(scan[:start])
+                held = ""
+                in_think = True
+                if not think_notified:
+                    self._flush_tokens()
+                    self.thinking_started.emit()
+                text = scan[start + len(_THINK_OPEN):]
+        # Held text that never became a tag was visible all along
+        show(held)
+
+        clean = "".join(clean_chunks).strip()
+        return clean or "".join(raw_chunks).strip()
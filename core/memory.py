@@ -3,20 +3,99 @@ KOMALAM Memory Manager — FAISS vector store + sentence-transformers for RAG.
 All processing runs locally, zero external API calls.
 """
 
+import io
 import os
 import json
+import atexit
+import mmap
+import hashlib
 import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
 
 import numpy as np
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 log = logging.getLogger(__name__)
 
+
+def _dump_record(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _load_record(line: bytes) -> dict:
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def _write_atomic(path: str, data):
+    """Write *data* to a temp file, fsync it, then rename it over *path*."""
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except OSError as exc:
+        log.error("Failed to write %s: %s", os.path.basename(path), exc)
+
+
+def _append_durable(path: str, data: bytes):
+    try:
+        with open(path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except OSError as exc:
+        log.error("Failed to append to %s: %s", os.path.basename(path), exc)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
 _PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(_PROJECT_ROOT, "data")
 FAISS_DIR = os.path.join(DATA_DIR, "faiss_index")
-META_FILE = os.path.join(FAISS_DIR, "metadata.json")
+META_FILE = os.path.join(FAISS_DIR, "metadata.jsonl")
+LEGACY_META_FILE = os.path.join(FAISS_DIR, "metadata.json")
 INDEX_FILE = os.path.join(FAISS_DIR, "index.faiss")
+# Row i holds the normalized embedding for embedding_id i
+VECS_FILE = os.path.join(FAISS_DIR, "embeddings.f32")
+EMBED_CACHE_FILE = os.path.join(FAISS_DIR, "embed_cache.npy")
+ONNX_DIR = os.path.join(DATA_DIR, "onnx_model")
+ONNX_MODEL_FILE = os.path.join(ONNX_DIR, "model_quantized.onnx")
+
+# Embeddings of recently seen texts, keyed by content hash (FIFO-bounded)
+_EMBED_CACHE_SIZE = 1024
+_EMBED_CACHE: dict[bytes, np.ndarray] = {}
+_EMBED_CACHE_ORDER: deque = deque()
+
+
+def _text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _cache_put(key: bytes, vector: np.ndarray):
+    if key in _EMBED_CACHE:
+        return
+    if len(_EMBED_CACHE_ORDER) >= _EMBED_CACHE_SIZE:
+        _EMBED_CACHE.pop(_EMBED_CACHE_ORDER.popleft(), None)
+    _EMBED_CACHE[key] = vector
+    _EMBED_CACHE_ORDER.append(key)
+
 
 # Lazy-loaded at first use to keep startup fast
 faiss = None
@@ -28,20 +107,84 @@ def _load_deps():
     if faiss is None:
         import faiss as _faiss
         faiss = _faiss
+        # Searches are one query at a time; a small team avoids OpenMP spin-up cost
+        faiss.omp_set_num_threads(min(4, os.cpu_count() or 1))
     if SentenceTransformer is None:
         from sentence_transformers import SentenceTransformer as _ST
         SentenceTransformer = _ST
 
 
+class _OnnxEncoder:
+    """
+    Drop-in for SentenceTransformer.encode() backed by an INT8 ONNX Runtime
+    session: tokenize, run the graph, then attention-masked mean pooling.
+    """
+
+    def __init__(self, session, tokenizer):
+        self._session = session
+        self._tokenizer = tokenizer
+        self._input_names = [i.name for i in session.get_inputs()]
+
+    def encode(
+        self, texts: list[str], batch_size: int = 32, convert_to_numpy: bool = True, device: str = "cpu"
+    ) -> np.ndarray:
+        pooled = []
+        for start in range(0, len(texts), batch_size):
+            batch = self._tokenizer(
+                texts[start:start + batch_size],
+                padding=True, truncation=True, max_length=256, return_tensors="np",
+            )
+            feeds = {name: batch[name].astype("int64") for name in self._input_names}
+            hidden = self._session.run(None, feeds)[0]
+            mask = batch["attention_mask"][..., None].astype("float32")
+            pooled.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        return np.vstack(pooled)
+
+
+def _export_onnx(model_id: str):
+    """One-time export of *model_id* to ONNX with dynamic INT8 quantization."""
+    import tempfile
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+        model.save_pretrained(export_dir)
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        quantizer.quantize(
+            save_dir=ONNX_DIR,
+            quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False),
+        )
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(ONNX_DIR)
+
+
 class MemoryManager:
     """
-    Long-term memory backed by a FAISS flat-L2 index.
+    Long-term memory backed by a FAISS index. Embeddings are L2-normalized
+    and compared by inner product, so scores are cosine similarities (higher
+    is closer). The index type follows the number of vectors: exact search
+    (FlatIP) up to FLAT_MAX_VECTORS, HNSWFlat up to HNSW_FLAT_MAX_VECTORS,
+    and HNSW over 8-bit scalar-quantized vectors beyond that. Crossing a
+    threshold rebuilds the index from the stored vectors.
 
     Each message is embedded with all-MiniLM-L6-v2 (384-dim) and stored
     alongside JSON metadata for retrieval during inference.
     """
 
     EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+    FLAT_MAX_VECTORS = 5_000
+    HNSW_FLAT_MAX_VECTORS = 100_000
+    HNSW_M = 16
+    HNSW_SQ_M = 24
+    HNSW_EF_CONSTRUCTION = 100
+    # Rows preallocated in embeddings.f32 for a fresh store
+    MIN_VECTOR_CAPACITY = 1024
+    # New memories are embedded and indexed in batches of this size
+    ADD_BATCH_SIZE = 32
+    # The index file is rewritten at most this often (and on close); anything
+    # newer is re-indexed from embeddings.f32 on the next load
+    INDEX_SAVE_INTERVAL_S = 60.0
 
     def __init__(self):
         _load_deps()
@@ -49,9 +192,47 @@ class MemoryManager:
 
         self._index = None
         self._metadata: list[dict] = []
+        # Accepted but not yet embedded; ids continue on from the index
+        self._pending: list[dict] = []
+        # Lines currently in metadata.jsonl (adds plus tag updates)
+        self._meta_records = 0
+        self._vecs: Optional[np.memmap] = None
+        self._capacity = 0
         self._model = None
+        self._device = "cpu"
         self._available = True
+        # Disk writes run here, one at a time and in submission order, so a
+        # compaction can never land on top of a later append
+        self._save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-save")
+        self._index_write: Optional[Future] = None
+        # The in-memory index holds vectors the index file does not yet
+        self._index_dirty = False
+        self._index_saved_at = time.monotonic()
+        # Set when the model encoded something new; the sidecar is rewritten on close
+        self._embed_cache_dirty = False
         self._load_index()
+        self._load_embed_cache()
+        atexit.register(self.close)
+
+    def close(self):
+        """Flush pending memories and wait for every queued write to land."""
+        self.flush()
+        # A warm-start cache only: written once per session, not per turn
+        if self._embed_cache_dirty:
+            self._save_embed_cache()
+        self._save_executor.shutdown(wait=True)
+
+    def _submit_write(self, fn, *args) -> Optional[Future]:
+        try:
+            return self._save_executor.submit(fn, *args)
+        except RuntimeError:
+            # Executor already shut down (interpreter exit): write inline
+            fn(*args)
+            return None
+
+    def warm_up(self) -> bool:
+        """Load the embedding model now so the first message only pays for inference."""
+        return self._get_model() is not None
 
     def _get_model(self):
         """Load the embedding model, trying cached (offline) first."""
@@ -60,12 +241,22 @@ class MemoryManager:
 
         model_name = "all-MiniLM-L6-v2"
 
+        device = self._configure_torch()
+        self._device = device
+
+        # Quantized ONNX Runtime is several times faster than eager PyTorch on
+        # CPU; with a CUDA device the PyTorch model on the GPU wins
+        if device == "cpu":
+            self._model = self._load_onnx_model("sentence-transformers/" + model_name)
+            if self._model is not None:
+                return self._model
+
         # Prefer local cache so the app works offline after initial setup
         try:
             os.environ["HF_HUB_OFFLINE"] = "1"
             os.environ["TRANSFORMERS_OFFLINE"] = "1"
-            self._model = SentenceTransformer(model_name, local_files_only=True)
-            return self._model
+            self._model = SentenceTransformer(model_name, device=device, local_files_only=True)
+            return self._model.eval()
         except OSError:
             pass
         finally:
@@ -74,7 +265,7 @@ class MemoryManager:
 
         # Fallback: download from HuggingFace
         try:
-            self._model = SentenceTransformer(model_name)
+            self._model = SentenceTransformer(model_name, device=device)
         except Exception:
             log.warning(
                 "Embedding model unavailable. Run setup.bat with internet to download it."
@@ -82,37 +273,355 @@ class MemoryManager:
             self._available = False
             return None
 
-        return self._model
+        return self._model.eval()
+
+    @staticmethod
+    def _configure_torch() -> str:
+        """Process-wide torch thread setup; returns the device to load the model on."""
+        try:
+            import torch
+        except ImportError:
+            return "cpu"
+
+        if torch.cuda.is_available():
+            return "cuda"
+        torch.set_num_threads(os.cpu_count() or 1)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # only settable before torch starts its first parallel work
+        return "cpu"
+
+    @staticmethod
+    def _load_onnx_model(model_id: str) -> Optional[_OnnxEncoder]:
+        """The INT8 ONNX encoder, exporting it on first use; None if unavailable."""
+        try:
+            import onnxruntime
+            from transformers import AutoTokenizer
+        except ImportError:
+            return None
+        try:
+            if not os.path.exists(ONNX_MODEL_FILE):
+                _export_onnx(model_id)
+            session = onnxruntime.InferenceSession(
+                ONNX_MODEL_FILE, providers=["CPUExecutionProvider"]
+            )
+            tokenizer = AutoTokenizer.from_pretrained(ONNX_DIR)
+        except Exception as exc:
+            log.info("ONNX embedding model unavailable, using PyTorch: %s", exc)
+            return None
+        return _OnnxEncoder(session, tokenizer)
 
     def _load_index(self):
-        if os.path.exists(INDEX_FILE) and os.path.exists(META_FILE):
-            try:
+        meta_exists = os.path.exists(META_FILE) or os.path.exists(LEGACY_META_FILE)
+        if not meta_exists:
+            self._create_empty_index()
+            self._open_vectors()
+            return
+        try:
+            self._metadata = self._read_metadata()
+        except (OSError, ValueError) as exc:
+            log.warning("Corrupted memory metadata, starting empty: %s", exc)
+            self._open_vectors()
+            self._reset_index()
+            return
+        self._open_vectors()
+        try:
+            # No index file yet means none was saved before exit; the
+            # memories are re-indexed from embeddings.f32 below
+            if os.path.exists(INDEX_FILE):
                 self._index = faiss.read_index(INDEX_FILE)
-                with open(META_FILE, "r", encoding="utf-8") as f:
-                    self._metadata = json.load(f)
-            except (OSError, json.JSONDecodeError) as exc:
-                log.warning("Corrupted index, rebuilding: %s", exc)
-                self._create_empty_index()
+            else:
+                self._index = self._choose_index(0)
+        except (OSError, RuntimeError) as exc:
+            log.warning("Corrupted index, rebuilding: %s", exc)
+            self._rebuild_index()
+            return
+        ntotal = self._index.ntotal
+        migrate = (
+            not isinstance(self._index, (faiss.IndexFlat, faiss.IndexHNSW))
+            or self._index.metric_type != faiss.METRIC_INNER_PRODUCT
+        )
+        # The index file is written lazily, so memories added after its
+        # last save may only be in metadata.jsonl. Their vectors were
+        # stored before their records were appended: index them again.
+        unsaved = len(self._metadata) - ntotal
+        if unsaved > 0 and not migrate and self._capacity >= len(self._metadata):
+            self._index.add(self._vecs[ntotal:len(self._metadata)])
+            self._index_dirty = True
+            log.info("Re-indexed %d memories missing from the saved index", unsaved)
+            ntotal = self._index.ntotal
+        elif unsaved > 0:
+            # Records with no vector: drop them from the log too, or the
+            # next add would be appended at the wrong row
+            del self._metadata[ntotal:]
+            self._compact_metadata()
+        if migrate or self._capacity < ntotal:
+            # Older layouts kept vectors only inside the index
+            vectors = self._index.reconstruct_n(0, ntotal)
+            if migrate:
+                faiss.normalize_L2(vectors)
+            self._store_vectors(0, vectors)
+        if migrate:
+            self._migrate_index()
+        elif self._maybe_upgrade_index() or self._index_dirty:
+            self._write_index()
+
+    def _rebuild_index(self):
+        """Index the stored vectors afresh, or start empty if any are missing."""
+        n = len(self._metadata)
+        if self._capacity < n:
+            log.warning("Stored vectors cover %d of %d memories; starting empty", self._capacity, n)
+            self._reset_index()
+            return
+        self._build_index(n)
+        log.info("Rebuilt memory index from %d stored vectors", n)
+        self._write_index()
+
+    def _reset_index(self):
+        """Drop every memory, on disk too, so new rows and records line up again."""
+        self._create_empty_index()
+        self._compact_metadata()
+        self._write_index()
+
+    def _read_metadata(self) -> list[dict]:
+        """Replay metadata.jsonl (or convert an old metadata.json) into a list."""
+        if not os.path.exists(META_FILE):
+            with open(LEGACY_META_FILE, "r", encoding="utf-8") as f:
+                self._metadata = json.load(f)
+            self._compact_metadata()
+            self._submit_write(_remove_file, LEGACY_META_FILE)
+            return self._metadata
+
+        metadata: list[dict] = []
+        records = 0
+        torn_at = None
+        with open(META_FILE, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for line in iter(mm.readline, b""):
+                        if not line.strip():
+                            continue
+                        try:
+                            record = _load_record(line)
+                        except ValueError:
+                            # Only the last line can be torn (a crash mid-append);
+                            # a bad line anywhere else is real corruption
+                            if mm.tell() < size:
+                                raise
+                            torn_at = mm.tell() - len(line)
+                            break
+                        records += 1
+                        if record.get("op") == "tags":
+                            row = record["embedding_id"]
+                            if 0 <= row < len(metadata):
+                                metadata[row]["tags"] = record["tags"]
+                        else:
+                            metadata.append(record)
+        if torn_at is not None:
+            log.warning("Dropping a torn record at the end of %s", os.path.basename(META_FILE))
+            os.truncate(META_FILE, torn_at)
+        self._meta_records = records
+        return metadata
+
+    def _tier(self, n: int) -> int:
+        """0 = FlatIP, 1 = HNSWFlat, 2 = HNSWSQ for an index holding *n* vectors."""
+        if n < self.FLAT_MAX_VECTORS:
+            return 0
+        if n < self.HNSW_FLAT_MAX_VECTORS:
+            return 1
+        return 2
+
+    @staticmethod
+    def _index_tier(index) -> int:
+        if isinstance(index, faiss.IndexHNSWSQ):
+            return 2
+        if isinstance(index, faiss.IndexHNSW):
+            return 1
+        return 0
+
+    def _choose_index(self, n: int):
+        """Return an empty (untrained) index suited to *n* vectors."""
+        tier = self._tier(n)
+        if tier == 0:
+            return faiss.IndexFlatIP(self.EMBEDDING_DIM)
+        if tier == 1:
+            index = faiss.IndexHNSWFlat(
+                self.EMBEDDING_DIM, self.HNSW_M, faiss.METRIC_INNER_PRODUCT
+            )
         else:
-            self._create_empty_index()
+            index = faiss.IndexHNSWSQ(
+                self.EMBEDDING_DIM, faiss.ScalarQuantizer.QT_8bit, self.HNSW_SQ_M,
+                faiss.METRIC_INNER_PRODUCT,
+            )
+        index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+        return index
+
+    def _build_index(self, n: int):
+        """Index the first *n* stored vectors with the type _choose_index picks."""
+        index = self._choose_index(n)
+        if n:
+            vectors = self._vecs[:n]
+            if not index.is_trained:
+                index.train(vectors)
+            index.add(vectors)
+        self._index = index
+        self._autotune_hnsw(n)
 
     def _create_empty_index(self):
-        self._index = faiss.IndexFlatL2(self.EMBEDDING_DIM)
+        self._index = self._choose_index(0)
         self._metadata = []
 
+    def _migrate_index(self):
+        """Rebuild an index saved by older versions (L2) for cosine search, keeping ids."""
+        ntotal = self._index.ntotal
+        self._build_index(ntotal)
+        log.info("Migrated %d memories to a cosine %s index", ntotal, type(self._index).__name__)
+        self._save_index()
+
+    def _maybe_upgrade_index(self) -> bool:
+        """Move to the next index type once the vector count crosses its threshold."""
+        ntotal = self._index.ntotal
+        if self._tier(ntotal) <= self._index_tier(self._index):
+            return False
+        # Vectors come from embeddings.f32, so nothing is re-embedded
+        self._build_index(ntotal)
+        log.info("Upgraded memory index to %s (%d vectors)", type(self._index).__name__, ntotal)
+        return True
+
+    def _autotune_hnsw(self, n: int):
+        """Widen the search beam as the index grows to hold recall steady."""
+        if not isinstance(self._index, faiss.IndexHNSW):
+            return
+        if n < 100_000:
+            ef = 40
+        elif n < 1_000_000:
+            ef = 100
+        else:
+            ef = 200
+        self._index.hnsw.efSearch = ef
+
+    def _open_vectors(self):
+        """Map embeddings.f32, creating it if needed; capacity follows its size."""
+        if not os.path.exists(VECS_FILE):
+            open(VECS_FILE, "wb").close()
+        row_bytes = self.EMBEDDING_DIM * 4
+        self._capacity = os.path.getsize(VECS_FILE) // row_bytes
+        self._vecs = self._map_vectors() if self._capacity else None
+
+    def _map_vectors(self) -> np.memmap:
+        return np.memmap(
+            VECS_FILE, dtype="float32", mode="r+",
+            shape=(self._capacity, self.EMBEDDING_DIM),
+        )
+
+    def _ensure_capacity(self, rows: int):
+        """Grow the vector file by doubling so appends stay amortized O(1)."""
+        if rows <= self._capacity:
+            return
+        new_capacity = max(rows, 2 * self._capacity, self.MIN_VECTOR_CAPACITY)
+        if self._vecs is not None:
+            self._vecs.flush()
+            self._vecs = None  # unmap before resizing (required on Windows)
+        os.truncate(VECS_FILE, new_capacity * self.EMBEDDING_DIM * 4)
+        self._capacity = new_capacity
+        self._vecs = self._map_vectors()
+
+    def _store_vectors(self, start: int, vectors: np.ndarray):
+        self._ensure_capacity(start + len(vectors))
+        self._vecs[start:start + len(vectors)] = vectors
+        self._vecs.flush()
+
     def _save_index(self):
+        """Rewrite both the index and a compacted metadata log."""
+        self._compact_metadata()
+        self._write_index()
+
+    def _write_index(self):
+        """Queue an atomic rewrite of the index file."""
+        self._index_dirty = False
+        self._index_saved_at = time.monotonic()
+        # Serialize here, while no add can race it; only the bytes cross threads
         try:
-            faiss.write_index(self._index, INDEX_FILE)
-            with open(META_FILE, "w", encoding="utf-8") as f:
-                json.dump(self._metadata, f, ensure_ascii=False)
-        except OSError as exc:
-            log.error("Failed to persist index: %s", exc)
+            data = faiss.serialize_index(self._index)
+        except RuntimeError as exc:
+            log.error("Failed to serialize index: %s", exc)
+            return
+        # A newer snapshot supersedes one that has not started writing yet
+        if self._index_write is not None:
+            self._index_write.cancel()
+        self._index_write = self._submit_write(_write_atomic, INDEX_FILE, data)
+
+    def _append_metadata(self, records: list[dict]):
+        """Append records to metadata.jsonl; compact once the log is mostly stale."""
+        self._submit_write(_append_durable, META_FILE, b"".join(_dump_record(r) for r in records))
+        self._meta_records += len(records)
+        if self._meta_records > 2 * max(len(self._metadata), self.ADD_BATCH_SIZE):
+            self._compact_metadata()
+
+    def _compact_metadata(self):
+        """Rewrite metadata.jsonl as exactly one record per memory."""
+        data = b"".join(_dump_record(m) for m in self._metadata)
+        self._submit_write(_write_atomic, META_FILE, data)
+        self._meta_records = len(self._metadata)
+
+    def _load_embed_cache(self):
+        """Warm the embedding cache from the sidecar written by close()."""
+        if not os.path.exists(EMBED_CACHE_FILE):
+            return
+        try:
+            records = np.load(EMBED_CACHE_FILE)
+            for key, vector in zip(records["key"], records["vec"]):
+                _cache_put(bytes(key), vector)
+        except (OSError, ValueError) as exc:
+            log.warning("Ignoring unreadable embedding cache: %s", exc)
+
+    def _save_embed_cache(self):
+        records = np.empty(
+            len(_EMBED_CACHE_ORDER),
+            dtype=[("key", "S16"), ("vec", "float32", (self.EMBEDDING_DIM,))],
+        )
+        for row, key in enumerate(_EMBED_CACHE_ORDER):
+            records[row] = (key, _EMBED_CACHE[key])
+        buf = io.BytesIO()
+        np.save(buf, records)
+        self._submit_write(_write_atomic, EMBED_CACHE_FILE, buf.getbuffer())
+        self._embed_cache_dirty = False
 
     def _embed(self, text: str) -> Optional[np.ndarray]:
+        return self._embed_batch([text])
+
+    def _embed_batch(self, texts: list[str]) -> Optional[np.ndarray]:
+        """Normalized embeddings for *texts*; only cache misses reach the model."""
+        keys = [_text_key(text) for text in texts]
+        out = np.empty((len(texts), self.EMBEDDING_DIM), dtype="float32")
+        missing: dict[bytes, list[int]] = {}
+        for row, key in enumerate(keys):
+            cached = _EMBED_CACHE.get(key)
+            if cached is not None:
+                out[row] = cached
+            else:
+                missing.setdefault(key, []).append(row)
+        if not missing:
+            return out
+
         model = self._get_model()
         if model is None:
             return None
-        return model.encode([text], convert_to_numpy=True).astype("float32")
+        rows = [positions[0] for positions in missing.values()]
+        fresh = model.encode(
+            [texts[row] for row in rows],
+            batch_size=self.ADD_BATCH_SIZE,
+            convert_to_numpy=True,
+            device=self._device,
+        ).astype("float32")
+        faiss.normalize_L2(fresh)
+        for (key, positions), vector in zip(missing.items(), fresh):
+            out[positions] = vector
+            _cache_put(key, vector)
+        self._embed_cache_dirty = True
+        return out
 
     def add_to_memory(
         self,
@@ -122,102 +631,199 @@ class MemoryManager:
         timestamp: str = "",
         tags: Optional[list[str]] = None,
     ) -> int:
-        """Embed and store text. Returns the embedding index, or -1 if skipped."""
-        if not text or len(text.strip()) < 5:
-            return -1
-
-        embedding = self._embed(text)
-        if embedding is None:
-            return -1
-
-        embedding_id = self._index.ntotal
-        self._index.add(embedding)
-
-        self._metadata.append({
-            "text": text,
-            "message_id": message_id,
-            "conversation_id": conversation_id,
-            "timestamp": timestamp,
-            "tags": tags or [],
-            "embedding_id": embedding_id,
-        })
+        """
+        Queue text for storage. Returns its embedding index, or -1 if skipped.
+        Embedding happens in batches, or sooner when a search needs it; see
+        _index_pending().
+        """
+        return self.add_to_memory_batch(
+            [text], [message_id], [conversation_id], [timestamp], [tags or []]
+        )[0]
 
-        self._save_index()
-        return embedding_id
+    def add_to_memory_batch(
+        self,
+        texts: list[str],
+        message_ids: Optional[list[str]] = None,
+        conversation_ids: Optional[list[str]] = None,
+        timestamps: Optional[list[str]] = None,
+        tags: Optional[list[list[str]]] = None,
+    ) -> list[int]:
+        """
+        Queue many texts at once, given as parallel columns. Missing columns
+        default to empty, and missing timestamps to one shared "now".
+        Returns an embedding index (or -1 if skipped) per text; however many
+        are queued, they reach the model together in at most one flush.
+        """
+        n = len(texts)
+        keep = [bool(text) and len(text.strip()) >= 5 for text in texts]
+        if not any(keep) or self._get_model() is None:
+            return [-1] * n
+        message_ids = message_ids or [""] * n
+        conversation_ids = conversation_ids or [""] * n
+        if timestamps is None:
+            timestamps = [datetime.now().isoformat()] * n
+        tags = tags or [[] for _ in range(n)]
+
+        next_id = self._index.ntotal + len(self._pending)
+        ids = []
+        for text, ok, msg_id, conv_id, ts, item_tags in zip(
+            texts, keep, message_ids, conversation_ids, timestamps, tags
+        ):
+            if not ok:
+                ids.append(-1)
+                continue
+            self._pending.append({
+                "text": text,
+                "message_id": msg_id,
+                "conversation_id": conv_id,
+                "timestamp": ts,
+                "tags": list(item_tags),
+                "embedding_id": next_id,
+            })
+            ids.append(next_id)
+            next_id += 1
 
-    def retrieve(self, query: str, top_k: int = 5) -> list[dict]:
-        """Semantic nearest-neighbour search over stored memories."""
-        if self._index.ntotal == 0:
-            return []
+        if len(self._pending) >= self.ADD_BATCH_SIZE:
+            self._index_pending()
+        return ids
 
-        query_embedding = self._embed(query)
-        if query_embedding is None:
-            return []
+    def flush(self):
+        """Index pending memories and write the index file now."""
+        self._index_pending()
+        if self._index_dirty:
+            self._write_index()
 
-        k = min(top_k, self._index.ntotal)
-        distances, indices = self._index.search(query_embedding, k)
+    def _index_pending(self):
+        """
+        Embed all pending memories in one batch and add them to the in-memory
+        index, so they are searchable at once. Their vectors and metadata go
+        to disk here; the index file itself follows on INDEX_SAVE_INTERVAL_S.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        embeddings = self._embed_batch([meta["text"] for meta in pending])
+        if embeddings is None:
+            log.warning("Embedding model went away; dropped %d pending memories", len(pending))
+            return
+
+        start = self._index.ntotal
+        self._store_vectors(start, embeddings)
+        self._index.add(self._vecs[start:start + len(embeddings)])
+        self._metadata.extend(pending)
+        self._maybe_upgrade_index()
+        self._append_metadata(pending)
+        self._index_dirty = True
+        if time.monotonic() - self._index_saved_at >= self.INDEX_SAVE_INTERVAL_S:
+            self._write_index()
+
+    def retrieve(self, query: str, top_k: int = 5, threshold: Optional[float] = None) -> list[dict]:
+        """
+        Semantic nearest-neighbour search over stored memories. With
+        *threshold*, matches whose cosine similarity is below it are dropped.
+        """
+        return self.retrieve_many([query], top_k, threshold)[0]
 
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < 0 or idx >= len(self._metadata):
-                continue
-            meta = self._metadata[idx]
-            # TODO: add a configurable distance threshold to filter weak matches
-            results.append({
-                "text": meta["text"],
-                "score": float(distances[0][i]),
-                "message_id": meta.get("message_id", ""),
-                "conversation_id": meta.get("conversation_id", ""),
-                "timestamp": meta.get("timestamp", ""),
-                "tags": meta.get("tags", []),
-            })
+    def retrieve_many(
+        self, queries: list[str], top_k: int = 5, threshold: Optional[float] = None
+    ) -> list[list[dict]]:
+        """retrieve() for several queries with one encode and one index search."""
+        self._index_pending()
+        if not queries or self._index.ntotal == 0:
+            return [[] for _ in queries]
 
-        return results
+        query_embeddings = self._embed_batch(queries)
+        if query_embeddings is None:
+            return [[] for _ in queries]
 
-    def build_context(self, query: str, top_k: int = 5) -> str:
+        k = min(top_k, self._index.ntotal)
+        # Inner product over unit vectors: scores are cosine similarity, best first
+        all_scores, all_indices = self._index.search(query_embeddings, k)
+
+        batches = []
+        for scores, indices in zip(all_scores, all_indices):
+            keep = (indices >= 0) & (indices < len(self._metadata))
+            if threshold is not None:
+                keep &= scores >= threshold
+            results = []
+            for score, idx in zip(scores[keep].tolist(), indices[keep].tolist()):
+                meta = self._metadata[idx]
+                results.append({
+                    "text": meta["text"],
+                    "score": score,
+                    "message_id": meta.get("message_id", ""),
+                    "conversation_id": meta.get("conversation_id", ""),
+                    "timestamp": meta.get("timestamp", ""),
+                    "tags": meta.get("tags", []),
+                })
+            batches.append(results)
+        return batches
+
+    def build_context(self, query: str, top_k: int = 5, threshold: Optional[float] = None) -> str:
         """Format retrieved memories as a context block for the LLM prompt."""
-        results = self.retrieve(query, top_k)
-        if not results:
-            return ""
-        return "\n".join(
-            f"[Memory {i}] {r['text']}" for i, r in enumerate(results, 1)
-        )
+        results = self.retrieve(query, top_k, threshold)
+        return self.format_context([r["text"] for r in results])
 
-    def tag_memory(self, embedding_id: int, tag: str):
+    @staticmethod
+    def format_context(texts: list[str]) -> str:
+        return "\n".join("[Memory %d] %s" % (i, t) for i, t in enumerate(texts, 1))
+
+    def _meta_for(self, embedding_id: int) -> Optional[dict]:
         if 0 <= embedding_id < len(self._metadata):
-            tags = self._metadata[embedding_id].setdefault("tags", [])
+            return self._metadata[embedding_id]
+        pending_pos = embedding_id - len(self._metadata)
+        if 0 <= pending_pos < len(self._pending):
+            return self._pending[pending_pos]
+        return None
+
+    def tag_memory(self, embedding_id: int, tag: str):
+        meta = self._meta_for(embedding_id)
+        if meta is not None:
+            tags = meta.setdefault("tags", [])
             if tag not in tags:
                 tags.append(tag)
-                self._save_index()
+                self._log_tags(embedding_id, tags)
 
     def untag_memory(self, embedding_id: int, tag: str):
-        if 0 <= embedding_id < len(self._metadata):
-            tags = self._metadata[embedding_id].get("tags", [])
+        meta = self._meta_for(embedding_id)
+        if meta is not None:
+            tags = meta.get("tags", [])
             if tag in tags:
                 tags.remove(tag)
-                self._save_index()
+                self._log_tags(embedding_id, tags)
+
+    def _log_tags(self, embedding_id: int, tags: list[str]):
+        # Pending memories carry their tags into the add record at flush time
+        if embedding_id < len(self._metadata):
+            self._append_metadata([{"op": "tags", "embedding_id": embedding_id, "tags": tags}])
 
     def prune(self, older_than_days: int = 0) -> int:
         """
         Drop memories older than *older_than_days* and rebuild the index.
         Returns the number of entries removed.
         """
+        self._index_pending()
         if older_than_days <= 0 or not self._metadata:
             return 0
 
-        from datetime import datetime, timedelta
         cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
 
-        keep = [m for m in self._metadata if not m.get("timestamp") or m["timestamp"] >= cutoff]
-        removed = len(self._metadata) - len(keep)
+        keep_rows = [
+            row for row, m in enumerate(self._metadata)
+            if not m.get("timestamp") or m["timestamp"] >= cutoff
+        ]
+        removed = len(self._metadata) - len(keep_rows)
         if removed == 0:
             return 0
 
-        self._create_empty_index()
-        for meta in keep:
-            embedding = self._embed(meta["text"])
-            meta["embedding_id"] = self._index.ntotal
-            self._index.add(embedding)
+        # HNSW can't delete in place, so rebuild from the stored vectors
+        # rather than running the embedding model again
+        keep = [self._metadata[row] for row in keep_rows]
+        self._store_vectors(0, self._vecs[np.asarray(keep_rows, dtype="int64")])
+        self._build_index(len(keep))
+        for new_id, meta in enumerate(keep):
+            meta["embedding_id"] = new_id
         self._metadata = keep
         self._save_index()
 
@@ -226,13 +832,18 @@ class MemoryManager:
 
     def get_stats(self) -> dict:
         return {
-            "total_memories": self._index.ntotal if self._index else 0,
+            "total_memories": (self._index.ntotal if self._index else 0) + len(self._pending),
             "index_file_size": (
                 os.path.getsize(INDEX_FILE) if os.path.exists(INDEX_FILE) else 0
             ),
         }
 
     def clear_all(self):
+        self._pending = []
+        _EMBED_CACHE.clear()
+        _EMBED_CACHE_ORDER.clear()
+        self._submit_write(_remove_file, EMBED_CACHE_FILE)
+        self._embed_cache_dirty = False
         self._create_empty_index()
         self._save_index()
         log.info("All memories cleared")
@@ -0,0 +1,96 @@
+"""
+KOMALAM Persistence Worker
+Runs Database and MemoryManager operations on a background QThread so the
+GUI never waits on a commit, an embedding pass or a vector search.
+"""
+
+import queue
+import logging
+from typing import Any, Callable, Optional
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.database import Database
+
+log = logging.getLogger(__name__)
+
+
+class _NoMemory(Exception):
+    """Raised for a memory op queued while no MemoryManager is attached."""
+
+
+class PersistenceWorker(QThread):
+    """
+    FIFO executor for storage calls. Each submitted op runs on this thread and
+    its result is handed to the optional callback back on the thread that owns
+    the worker (the GUI thread), via a queued signal. Ops run in submission
+    order, so a write followed by a read sees the write.
+
+    The MemoryManager is not thread-safe; once attached it must only be used
+    from ops running here (``submit_memory``, or ``self.memory`` inside a
+    ``submit`` op).
+
+    Writes an op queues commit later on the database's writer thread; a write
+    that fails there is reported through op_failed as well.
+    """
+
+    op_failed = pyqtSignal(str)
+    # (callback, result); connected to _deliver so the callback runs on the GUI thread
+    _op_done = pyqtSignal(object, object)
+
+    def __init__(self, db: Database):
+        super().__init__()
+        self._db = db
+        self.memory = None
+        self._ops: queue.Queue = queue.Queue()
+        self._op_done.connect(self._deliver)
+        # Emitted from the writer thread; Qt queues it to the GUI like any other
+        db.on_write_error = lambda exc: self.op_failed.emit(f"Write failed: {exc}")
+
+    def set_memory(self, memory):
+        """Hand the loaded MemoryManager to the worker for later ops."""
+        self._ops.put((self._attach_memory, memory, None))
+
+    def _attach_memory(self, memory):
+        self.memory = memory
+
+    def submit(self, op: Callable[[Database], Any], callback: Optional[Callable[[Any], None]] = None):
+        """Queue *op* to run against the database; *callback* receives its result."""
+        self._ops.put((op, self._db, callback))
+
+    def submit_memory(self, op: Callable[[Any], Any], callback: Optional[Callable[[Any], None]] = None):
+        """
+        Queue *op* to run against the MemoryManager. Skipped (and *callback*
+        not called) if memory never loaded.
+        """
+        self._ops.put((self._run_memory_op, op, callback))
+
+    def _run_memory_op(self, op: Callable[[Any], Any]):
+        if self.memory is None:
+            raise _NoMemory
+        return op(self.memory)
+
+    def stop(self, timeout_ms: int = 5000):
+        """Finish the ops already queued, then end the thread."""
+        self._ops.put(None)
+        self.wait(timeout_ms)
+
+    def run(self):
+        while True:
+            item = self._ops.get()
+            if item is None:
+                break
+            op, arg, callback = item
+            try:
+                result = op(arg)
+            except _NoMemory:
+                continue
+            except Exception as exc:
+                log.error("Persistence op failed: %s", exc)
+                self.op_failed.emit(str(exc))
+                continue
+            if callback is not None:
+                self._op_done.emit(callback, result)
+
+    def _deliver(self, callback: Callable[[Any], None], result: Any):
+        callback(result)
@@ -0,0 +1,65 @@
+"""
+KOMALAM Response Cache
+Replays a stored reply when a prompt repeats under the same model, system
+prompt and retrieved memory context, skipping the LLM call entirely.
+"""
+
+import hashlib
+from typing import Optional
+
+from core.database import Database
+
+
+def normalize_prompt(text: str) -> str:
+    """Case and runs of whitespace never change the answer."""
+    return " ".join(text.lower().split())
+
+
+def _digest(parts) -> str:
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Replies stored in the response_cache table, keyed by a hash of the model,
+    system prompt and normalized prompt. Only an exact match is looked up, so
+    prompts that differ in a single word or number never share a reply.
+
+    Each reply also records a fingerprint of the memories it was written
+    from, and only replays while the same memories come back. Earlier copies
+    of the prompt and of the cached reply itself are left out of it: asking
+    again stores both, and that alone must not count as new context.
+    """
+
+    MAX_ENTRIES = 2000
+
+    def __init__(self, db: Database):
+        self._db = db
+
+    @staticmethod
+    def key_for(model: str, system_prompt: str, prompt: str) -> str:
+        return _digest((model, system_prompt, normalize_prompt(prompt)))
+
+    @staticmethod
+    def context_key(memories: list[str], prompt: str, reply: str, limit: int) -> str:
+        """Fingerprint of the first *limit* memories other than *prompt* and *reply*."""
+        skip = {normalize_prompt(prompt), normalize_prompt(reply)}
+        kept = [m for m in memories if normalize_prompt(m) not in skip]
+        return _digest(kept[:limit])
+
+    def lookup(self, key: str, memories: list[str], prompt: str, limit: int) -> Optional[str]:
+        """The cached reply for *key* if its memory context still matches, or None."""
+        row = self._db.get_cached_response(key)
+        if row is None:
+            return None
+        response, context_hash = row
+        if self.context_key(memories, prompt, response, limit) != context_hash:
+            return None
+        return response
+
+    def store(self, key: str, response: str, memories: list[str], prompt: str, limit: int):
+        context_hash = self.context_key(memories, prompt, response, limit)
+        self._db.put_cached_response(key, response, context_hash, self.MAX_ENTRIES)
+
+    def clear(self):
+        self._db.clear_response_cache()
@@ -19,20 +19,56 @@ def isolate_config(tmp_path, monkeypatch):
 
 
 class TestConfigManager:
-    def test_creates_default_config(self, isolate_config):
+    def test_defaults_without_config_file(self, isolate_config):
         cm = ConfigManager()
-        assert os.path.exists(isolate_config)
         assert cm.get("model") == "llama3.2"
         assert cm.get("theme") == "dark"
+        # Nothing is written until a setting changes
+        assert not os.path.exists(isolate_config)
+        assert cm.load() is False
+
+    def test_first_change_creates_config(self, isolate_config):
+        cm = ConfigManager()
+        cm.set("model", DEFAULT_CONFIG["model"])
+        cm.flush()
+        assert os.path.exists(isolate_config)
+        assert ConfigManager().load() is True
 
     def test_set_and_persist(self, isolate_config):
         cm = ConfigManager()
         cm.set("temperature", 1.2)
+        cm.flush()
         # Read back from disk
         with open(isolate_config) as f:
             data = json.load(f)
         assert data["temperature"] == 1.2
 
+    def test_set_is_debounced(self, isolate_config):
+        cm = ConfigManager()
+        cm.set("temperature", 1.1)
+        cm.set("temperature", 1.3)
+        assert not os.path.exists(isolate_config)
+        cm.flush()
+        with open(isolate_config) as f:
+            assert json.load(f)["temperature"] == 1.3
+
+    def test_unchanged_config_is_not_rewritten(self, isolate_config):
+        cm = ConfigManager()
+        cm.set("model", "custom-model")
+        cm.flush()
+        mtime = os.stat(isolate_config).st_mtime_ns
+        os.utime(isolate_config, ns=(mtime - 10**9, mtime - 10**9))
+        cm.set("model", "custom-model")
+        cm.flush()
+        assert os.stat(isolate_config).st_mtime_ns == mtime - 10**9
+
+    def test_config_read_on_first_access(self, isolate_config):
+        cm = ConfigManager()
+        # Written after construction: the file is only read on first get()
+        with open(isolate_config, "w") as f:
+            json.dump({"theme": "light"}, f)
+        assert cm.get("theme") == "light"
+
     def test_get_with_default(self, isolate_config):
         cm = ConfigManager()
         assert cm.get("nonexistent_key", 42) == 42
@@ -1,6 +1,7 @@
 """Tests for core.database module."""
 
 import os
+import sqlite3
 import tempfile
 import pytest
 
@@ -8,7 +9,8 @@ import pytest
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.database import Database
+from core.database import Database, _SQL_LIST_CONVERSATIONS
+from core.response_cache import ResponseCache
 
 
 @pytest.fixture
@@ -34,6 +36,12 @@ class TestConversations:
         # Most recently created should come first
         assert convs[0]["id"] == id2
 
+    def test_list_uses_covering_index(self, db):
+        plan = db._write_conn.execute(
+            "EXPLAIN QUERY PLAN " + _SQL_LIST_CONVERSATIONS, (50,)
+        ).fetchall()
+        assert "COVERING INDEX idx_conversations_updated" in plan[0][3]
+
     def test_delete(self, db):
         conv_id = db.create_conversation()
         db.delete_conversation(conv_id)
@@ -63,6 +71,41 @@ class TestMessages:
         assert msgs[0]["role"] == "user"
         assert msgs[1]["role"] == "assistant"
 
+    def test_add_with_known_id_and_embedding(self, db):
+        conv_id = db.create_conversation()
+        msg_id = db.add_message(conv_id, "user", "Hello", embedding_id=3, msg_id="fixed-id")
+        assert msg_id == "fixed-id"
+        msgs = db.get_messages(conv_id)
+        assert msgs[0]["id"] == "fixed-id"
+        assert msgs[0]["embedding_id"] == 3
+
+    def test_add_bulk(self, db):
+        conv_id = db.create_conversation()
+        ids = db.add_messages_bulk([
+            (conv_id, "user", "first"),
+            (conv_id, "assistant", "second", 7),
+        ])
+        msgs = db.get_messages(conv_id)
+        assert [m["id"] for m in msgs] == ids
+        assert msgs[1]["embedding_id"] == 7
+
+    def test_iter_messages_releases_connection(self, db):
+        conv_id = db.create_conversation()
+        db.add_messages_bulk([(conv_id, "user", str(i)) for i in range(3)])
+        for _ in range(Database.READ_POOL_SIZE + 1):
+            it = db.iter_messages(conv_id)
+            assert next(it)["content"] == "0"
+            it.close()  # abandoning a scan must hand its connection back
+        assert [m["content"] for m in db.iter_messages(conv_id)] == ["0", "1", "2"]
+
+    def test_timestamps_stored_as_integer_and_iso(self, db):
+        conv_id = db.create_conversation()
+        db.add_message(conv_id, "user", "Hello")
+        msg = db.get_messages(conv_id)[0]
+        assert isinstance(msg["timestamp_us"], int)
+        assert msg["timestamp"][10] == "T"
+        assert db.get_conversation(conv_id)["updated_at"] == msg["timestamp"]
+
     def test_cascade_delete(self, db):
         conv_id = db.create_conversation()
         db.add_message(conv_id, "user", "test message")
@@ -78,6 +121,90 @@ class TestMessages:
         msgs = db.get_messages(conv_id)
         assert msgs[0]["embedding_id"] == 42
 
+    def test_embedding_update_bulk(self, db):
+        conv_id = db.create_conversation()
+        ids = db.add_messages_bulk([(conv_id, "user", "a"), (conv_id, "user", "b")])
+        db.update_message_embeddings_bulk(zip([10, 11], ids))
+        msgs = db.get_messages(conv_id)
+        assert [m["embedding_id"] for m in msgs] == [10, 11]
+
+
+class TestWriteQueue:
+    def test_enqueued_writes_visible_after_flush(self, db):
+        conv_id = db.create_conversation("Queued")
+        db.enqueue_write(
+            "UPDATE conversations SET title = ? WHERE id = ?", ("Renamed", conv_id)
+        )
+        db.flush()
+        assert db.get_conversation(conv_id)["title"] == "Renamed"
+
+    def test_failed_write_does_not_drop_batch(self, db):
+        conv_id = db.create_conversation()
+        db.add_message("missing-conversation", "user", "orphan")  # FK violation
+        db.add_message(conv_id, "user", "kept")
+        msgs = db.get_messages(conv_id)
+        assert [m["content"] for m in msgs] == ["kept"]
+
+    def test_failed_write_reports_its_error(self, db):
+        errors = []
+        db.on_write_error = errors.append
+        conv_id = db.create_conversation()
+        bad = db.enqueue_write(
+            "INSERT INTO messages (id, conversation_id, role, content, timestamp) "
+            "VALUES ('m', 'missing-conversation', 'user', 'orphan', '')"
+        )
+        good = db.enqueue_write(
+            "UPDATE conversations SET title = ? WHERE id = ?", ("Still saved", conv_id)
+        )
+        assert isinstance(bad.exception(timeout=5), sqlite3.IntegrityError)
+        assert good.result(timeout=5) is None
+        assert len(errors) == 1 and isinstance(errors[0], sqlite3.IntegrityError)
+        assert db.get_conversation(conv_id)["title"] == "Still saved"
+
+    def test_transaction_future_carries_the_error(self, db):
+        with db.transaction() as done:
+            db.create_conversation()
+            db.add_message("missing-conversation", "user", "orphan")  # FK violation
+        assert isinstance(done.exception(timeout=5), sqlite3.IntegrityError)
+
+    def test_transaction_commits_as_one_group(self, db):
+        with db.transaction():
+            conv_id = db.create_conversation()
+            db.auto_title_conversation(conv_id, "Hello there")
+            msg_id = db.add_message(conv_id, "user", "Hello there")
+            db.update_message_embedding(msg_id, 7)
+            assert db._write_queue.qsize() == 0
+        assert db._write_queue.qsize() == 1
+        assert db.get_conversation(conv_id)["title"] == "Hello there"
+        assert db.get_messages(conv_id)[0]["embedding_id"] == 7
+
+    def test_transaction_rolls_back_together(self, db):
+        with db.transaction():
+            conv_id = db.create_conversation()
+            db.add_message("missing-conversation", "user", "orphan")  # FK violation
+        assert db.get_conversation(conv_id) is None
+
+    def test_transaction_discarded_on_exception(self, db):
+        with pytest.raises(ValueError):
+            with db.transaction():
+                conv_id = db.create_conversation()
+                raise ValueError
+        assert db.get_conversation(conv_id) is None
+
+
+class TestMaintenance:
+    def test_maintenance_stops_on_close(self, tmp_path):
+        db = Database(db_path=os.path.join(str(tmp_path), "maint.db"))
+        db.start_maintenance(interval_s=60)
+        db.create_conversation()
+        db._run_maintenance(60)  # optimize + checkpoint on a live database
+        timer = db._maintenance_timer
+        db.close()
+        timer.join(1)
+        assert not timer.is_alive()
+        # A late tick must not touch the closed connection
+        db._run_maintenance(60)
+
 
 class TestSearch:
     def test_search_messages_like_fallback(self, db):
@@ -87,6 +214,19 @@ class TestSearch:
         results = db.search_messages("comprehensions")
         assert len(results) >= 1
 
+    def test_search_messages_uses_stemmed_fts(self, db):
+        conv_id = db.create_conversation()
+        db.add_message(conv_id, "user", "She runs every morning")
+        # Porter stemming matches where a LIKE substring scan would not
+        results = db.search_messages("running")
+        assert len(results) == 1
+
+    def test_deleted_messages_leave_fts(self, db):
+        conv_id = db.create_conversation()
+        db.add_message(conv_id, "user", "ephemeral content")
+        db.delete_conversation(conv_id)
+        assert db.search_messages("ephemeral") == []
+
     def test_search_conversations(self, db):
         db.create_conversation("Machine Learning Discussion")
         db.create_conversation("Grocery List")
@@ -94,6 +234,30 @@ class TestSearch:
         assert len(results) == 1
         assert "Machine Learning" in results[0]["title"]
 
+    def test_search_conversations_by_message_prefix(self, db):
+        conv_id = db.create_conversation("Untitled")
+        db.create_conversation("Other")
+        db.add_message(conv_id, "user", "Tell me about photosynthesis")
+        results = db.search_conversations("photo")
+        assert [c["id"] for c in results] == [conv_id]
+
+    def test_search_conversations_tolerates_fts_syntax(self, db):
+        conv_id = db.create_conversation()
+        db.add_message(conv_id, "user", 'what does "AND" mean')
+        assert db.search_conversations('"AND') != []
+
+    def test_search_conversations_limit_covers_both_matches(self, db):
+        ids = {db.create_conversation(f"Apple {i}") for i in range(3)}
+        for _ in range(3):
+            conv_id = db.create_conversation("Untitled")
+            db.add_message(conv_id, "user", "an apple a day")
+            ids.add(conv_id)
+        results = db.search_conversations("app", limit=4)
+        assert len(results) == 4
+        assert {c["id"] for c in results} <= ids
+        updated = [c["updated_at"] for c in results]
+        assert updated == sorted(updated, reverse=True)
+
     def test_search_no_results(self, db):
         db.create_conversation("Hello World")
         results = db.search_conversations("nonexistent_query_xyz")
@@ -124,3 +288,143 @@ class TestTags:
         tags = db.get_all_tags()
         assert "alpha" in tags
         assert "beta" in tags
+
+
+class TestReadPool:
+    def test_exhausted_pool_raises_instead_of_blocking(self, db, monkeypatch):
+        monkeypatch.setattr(db, "READ_POOL_TIMEOUT_S", 0.05)
+        db.create_conversation("Held")
+        held = [db._iter_query("SELECT * FROM conversations") for _ in range(db.READ_POOL_SIZE)]
+        for rows in held:
+            next(rows)  # each open generator now holds a connection
+        with pytest.raises(RuntimeError, match="read connections are in use"):
+            db.get_conversations()
+        for rows in held:
+            rows.close()
+        assert len(db.get_conversations()) == 1
+
+
+class TestResponseCache:
+    def test_put_get_and_trim(self, db):
+        for i in range(3):
+            db.put_cached_response(f"h{i}", f"reply {i}", "c", max_entries=2)
+        assert db.get_cached_response("h0") is None
+        assert db.get_cached_response("h2") == ("reply 2", "c")
+        # Re-storing a key refreshes it, so it survives the next trim
+        db.put_cached_response("h1", "reply 1b", "c", max_entries=2)
+        db.put_cached_response("h3", "reply 3", "c", max_entries=2)
+        assert db.get_cached_response("h1") == ("reply 1b", "c")
+        assert db.get_cached_response("h2") is None
+
+    def test_clear(self, db):
+        db.put_cached_response("h", "reply", "c", max_entries=10)
+        db.clear_response_cache()
+        assert db.get_cached_response("h") is None
+
+    def test_lookup_and_store(self, db):
+        cache = ResponseCache(db)
+        key = ResponseCache.key_for("llama3.2", "Be brief.", "What is 2+3?")
+        assert cache.lookup(key, [], "What is 2+3?", 5) is None
+        cache.store(key, "5", [], "What is 2+3?", 5)
+        assert cache.lookup(key, [], "What is 2+3?", 5) == "5"
+        # Case and spacing are normalized away
+        assert ResponseCache.key_for("llama3.2", "Be brief.", "  what is 2+3? ") == key
+
+    def test_key_covers_everything_the_reply_depends_on(self, db):
+        cache = ResponseCache(db)
+        key = ResponseCache.key_for("m", "sys", "my name is Bob")
+        cache.store(key, "Hi Bob", ["ctx"], "my name is Bob", 5)
+        misses = [
+            ("m", "sys", "my name is Alice"),
+            ("other", "sys", "my name is Bob"),
+            ("m", "other", "my name is Bob"),
+        ]
+        for args in misses:
+            assert cache.lookup(ResponseCache.key_for(*args), ["ctx"], args[2], 5) is None, args
+        assert cache.lookup(key, ["new memories", "ctx"], "my name is Bob", 5) is None
+
+    def test_prompt_and_reply_copies_are_not_new_context(self, db):
+        cache = ResponseCache(db)
+        key = ResponseCache.key_for("m", "", "my name?")
+        cache.store(key, "Bob", ["a", "b"], "my name?", 2)
+        # Asking again stored both the prompt and the reply as memories
+        assert cache.lookup(key, ["My  name?", "Bob", "a", "b", "c"], "my name?", 2) == "Bob"
+
+    def test_clear_drops_cached_replies(self, db):
+        cache = ResponseCache(db)
+        key = ResponseCache.key_for("m", "", "hello")
+        cache.store(key, "hi", [], "hello", 5)
+        cache.clear()
+        assert cache.lookup(key, [], "hello", 5) is None
+
+
+class TestMigration:
+    def test_response_cache_without_context_hash_is_replaced(self, tmp_path):
+        db_path = os.path.join(str(tmp_path), "exact.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE response_cache (
+                prompt_hash TEXT PRIMARY KEY, response TEXT NOT NULL, created_at TEXT NOT NULL
+            );
+            INSERT INTO response_cache VALUES ('h', 'stale', '2024-01-01');
+        """)
+        conn.close()
+
+        db = Database(db_path=db_path)
+        try:
+            assert db.get_cached_response("h") is None
+        finally:
+            db.close()
+
+    def test_semantic_response_cache_table_is_replaced(self, tmp_path):
+        db_path = os.path.join(str(tmp_path), "semantic.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE response_cache (
+                prompt_hash TEXT PRIMARY KEY, scope TEXT NOT NULL,
+                embedding BLOB NOT NULL, response TEXT NOT NULL, created_at TEXT NOT NULL
+            );
+            INSERT INTO response_cache VALUES ('h', 's', x'00', 'stale', '2024-01-01');
+        """)
+        conn.close()
+
+        db = Database(db_path=db_path)
+        try:
+            assert db.get_cached_response("h") is None
+            db.put_cached_response("h", "fresh", "c", max_entries=10)
+            assert db.get_cached_response("h") == ("fresh", "c")
+        finally:
+            db.close()
+
+    def test_legacy_fts_table_is_rebuilt(self, tmp_path):
+        db_path = os.path.join(str(tmp_path), "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE conversations (
+                id TEXT PRIMARY KEY, title TEXT NOT NULL DEFAULT 'New Chat',
+                created_at TEXT NOT NULL, updated_at TEXT NOT NULL
+            );
+            CREATE TABLE messages (
+                id TEXT PRIMARY KEY, conversation_id TEXT NOT NULL,
+                role TEXT NOT NULL, content TEXT NOT NULL,
+                timestamp TEXT NOT NULL, embedding_id INTEGER DEFAULT -1
+            );
+            CREATE VIRTUAL TABLE messages_fts USING fts5(
+                content, content_rowid='rowid', tokenize='porter'
+            );
+            INSERT INTO conversations VALUES
+                ('c1', 'Old', '2024-01-01T00:00:00', '2024-01-01T00:00:00');
+            INSERT INTO messages VALUES
+                ('m1', 'c1', 'user', 'legacy runs text', '2024-01-01T00:00:00', -1);
+        """)
+        conn.close()
+
+        db = Database(db_path=db_path)
+        try:
+            results = db.search_messages("running")
+            assert [r["id"] for r in results] == ["m1"]
+            # timestamp_us is backfilled from the ISO column
+            msg = db.get_messages("c1")[0]
+            assert msg["timestamp_us"] > 0
+        finally:
+            db.close()
@@ -0,0 +1,178 @@
+"""Tests for core.memory module."""
+
+import hashlib
+import os
+import pytest
+
+# Ensure project root is importable
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+pytest.importorskip("faiss")
+
+from core import memory
+
+
+class StubEncoder:
+    """Stands in for SentenceTransformer: one fixed random vector per text."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def eval(self):
+        return self
+
+    def encode(self, texts, **kwargs):
+        return np.stack([
+            np.random.default_rng(
+                int.from_bytes(hashlib.sha1(t.encode("utf-8")).digest()[:8], "little")
+            ).standard_normal(memory.MemoryManager.EMBEDDING_DIM)
+            for t in texts
+        ]).astype("float32")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Point the memory files at a temp directory and stub out the model."""
+    faiss_dir = str(tmp_path)
+    monkeypatch.setattr(memory, "FAISS_DIR", faiss_dir)
+    monkeypatch.setattr(memory, "META_FILE", os.path.join(faiss_dir, "metadata.jsonl"))
+    monkeypatch.setattr(memory, "LEGACY_META_FILE", os.path.join(faiss_dir, "metadata.json"))
+    monkeypatch.setattr(memory, "INDEX_FILE", os.path.join(faiss_dir, "index.faiss"))
+    monkeypatch.setattr(memory, "VECS_FILE", os.path.join(faiss_dir, "embeddings.f32"))
+    monkeypatch.setattr(memory, "EMBED_CACHE_FILE", os.path.join(faiss_dir, "embed_cache.npy"))
+    monkeypatch.setattr(memory, "SentenceTransformer", StubEncoder)
+    monkeypatch.setattr(
+        memory.MemoryManager, "_load_onnx_model", staticmethod(lambda model_id: None)
+    )
+    memory._EMBED_CACHE.clear()
+    memory._EMBED_CACHE_ORDER.clear()
+    return tmp_path
+
+
+def _open():
+    mm = memory.MemoryManager()
+    mm.warm_up()
+    return mm
+
+
+def _seed(texts):
+    mm = _open()
+    for text in texts:
+        mm.add_to_memory(text)
+    mm.close()
+
+
+class TestRecovery:
+    def test_corrupt_index_keeps_new_memories_aligned(self, store):
+        _seed(["alpha memory one", "beta memory two", "gamma memory three"])
+        (store / "index.faiss").write_bytes(b"not an index")
+
+        mm = _open()
+        mm.add_to_memory("delta memory four")
+        mm.close()
+
+        mm = _open()
+        assert mm.retrieve("delta memory four", top_k=1)[0]["text"] == "delta memory four"
+        assert mm.retrieve("alpha memory one", top_k=1)[0]["text"] == "alpha memory one"
+        mm.close()
+
+    def test_corrupt_index_without_vectors_starts_empty(self, store):
+        _seed(["alpha memory one", "beta memory two"])
+        (store / "index.faiss").write_bytes(b"not an index")
+        os.remove(store / "embeddings.f32")
+
+        mm = _open()
+        assert mm.add_to_memory("delta memory four") == 0
+        mm.close()
+
+        mm = _open()
+        results = mm.retrieve("delta memory four", top_k=5)
+        assert [r["text"] for r in results] == ["delta memory four"]
+        mm.close()
+
+
+class TestMetadataLog:
+    def test_torn_last_record_is_dropped(self, store):
+        _seed(["alpha memory one", "beta memory two"])
+        meta = store / "metadata.jsonl"
+        with open(meta, "ab") as f:
+            f.write(b'{"text": "gamma mem')
+
+        mm = _open()
+        assert [m["text"] for m in mm._metadata] == ["alpha memory one", "beta memory two"]
+        mm.add_to_memory("delta memory four")
+        mm.close()
+
+        mm = _open()
+        assert len(mm._metadata) == 3
+        assert mm.retrieve("delta memory four", top_k=1)[0]["text"] == "delta memory four"
+        mm.close()
+
+    def test_bad_record_mid_log_is_corruption(self, store):
+        _seed(["alpha memory one", "beta memory two"])
+        meta = store / "metadata.jsonl"
+        lines = meta.read_bytes().splitlines(keepends=True)
+        meta.write_bytes(b"{broken\n" + b"".join(lines[1:]))
+
+        mm = _open()
+        assert mm._metadata == []
+        mm.close()
+
+
+class TestReplyCache:
+    """A turn as MainWindow runs it: prepare (retrieve, look up, store the prompt), then reply."""
+
+    @pytest.fixture
+    def window(self, store):
+        pytest.importorskip("PyQt5")
+        from types import SimpleNamespace
+        from core.database import Database
+        from core.response_cache import ResponseCache
+        from ui.main_window import MainWindow
+
+        class Window:
+            _prepare_reply = MainWindow._prepare_reply
+            _write_message = MainWindow._write_message
+            _retrieve_memories = staticmethod(MainWindow._retrieve_memories)
+
+        db = Database(db_path=str(store / "test.db"))
+        mm = _open()
+        w = Window()
+        w.persistence = SimpleNamespace(memory=mm)
+        w.response_cache = ResponseCache(db)
+        w.db, w.conv_id = db, db.create_conversation()
+        yield w
+        mm.close()
+        db.close()
+
+    @staticmethod
+    def _turn(w, prompt, reply):
+        """Run one turn; returns the replayed reply or None, and the context."""
+        cached, memories, context, key = w._prepare_reply(
+            w.db, w.conv_id, prompt, "m", "sys", 5, True,
+        )
+        if cached is None:
+            w.response_cache.store(key, reply, memories, prompt, 5)
+        w._write_message(w.db, w.conv_id, "assistant", cached or reply, index=cached is None)
+        return cached, context
+
+    def test_repeated_prompt_replays(self, window):
+        for text in ("alpha memory one", "beta memory two"):
+            window.persistence.memory.add_to_memory(text)
+
+        cached, context = self._turn(window, "What is my name?", "You are Bob.")
+        assert cached is None
+        assert "What is my name?" not in context
+        for _ in range(5):
+            cached, context = self._turn(window, "what is my  name?", "unused")
+            assert cached == "You are Bob."
+            assert "What is my name?" not in context
+
+    def test_new_memory_invalidates_reply(self, window):
+        self._turn(window, "What is my name?", "You are Bob.")
+        window.persistence.memory.add_to_memory("my name is actually Alice")
+        cached, _ = self._turn(window, "What is my name?", "You are Alice.")
+        assert cached is None
@@ -5,7 +5,7 @@ Scrollable message area with styled bubbles and an input bar.
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QFrame,
-    QLabel, QPushButton, QTextEdit, QSizePolicy, QApplication
+    QLabel, QPushButton, QTextEdit, QSizePolicy
 )
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtGui import QKeyEvent
@@ -73,18 +73,22 @@ class ChatWidget(QWidget):
 
     message_sent = pyqtSignal(str)
 
-    # Throttle scroll-to-bottom during streaming to avoid flooding the event loop
+    # Throttle bubble repaints and scroll-to-bottom during streaming to avoid
+    # flooding the event loop
     _SCROLL_INTERVAL_MS = 50
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self._streaming_bubble = None
+        # Streamed tokens; joined into the bubble at most once per timer tick
+        self._stream_buffer: list[str] = []
+        self._stream_dirty = False
         self._scroll_pending = False
         self._setup_ui()
 
         self._scroll_timer = QTimer(self)
         self._scroll_timer.setSingleShot(True)
-        self._scroll_timer.timeout.connect(self._do_scroll)
+        self._scroll_timer.timeout.connect(self._on_scroll_timer)
 
     def _setup_ui(self):
         layout = QVBoxLayout(self)
@@ -107,7 +111,7 @@ class ChatWidget(QWidget):
 
         # Input bar
         input_frame = QFrame()
-        input_frame.setStyleSheet("border-top: 1px solid palette(mid);")
+        input_frame.setObjectName("input_bar")
         input_layout = QHBoxLayout(input_frame)
         input_layout.setContentsMargins(16, 12, 16, 12)
         input_layout.setSpacing(12)
@@ -137,12 +141,25 @@ class ChatWidget(QWidget):
         if not self._scroll_timer.isActive():
             self._scroll_timer.start(self._SCROLL_INTERVAL_MS)
 
+    def _on_scroll_timer(self):
+        self._flush_stream_text()
+        self._do_scroll()
+
+    def _flush_stream_text(self):
+        if self._stream_dirty and self._streaming_bubble:
+            self._streaming_bubble.update_text("".join(self._stream_buffer))
+        self._stream_dirty = False
+
     def _do_scroll(self):
         scrollbar = self.scroll_area.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
 
-    def add_message(self, text: str, role: str = "user", timestamp: str = None) -> MessageBubble:
-        bubble = MessageBubble(text, role, timestamp)
+    def _bubble_row(
+        self, text: str, role: str, timestamp: str, parent: QWidget
+    ) -> tuple[MessageBubble, QHBoxLayout]:
+        # Parented up front so the bubble is polished once, in its final place,
+        # instead of again when the layout reparents it
+        bubble = MessageBubble(text, role, timestamp, parent=parent)
 
         wrapper = QHBoxLayout()
         if role == "user":
@@ -151,36 +168,69 @@ class ChatWidget(QWidget):
         else:
             wrapper.addWidget(bubble, stretch=0)
             wrapper.addStretch()
+        return bubble, wrapper
+
+    def add_message(self, text: str, role: str = "user", timestamp: str = None) -> MessageBubble:
+        bubble, wrapper = self._bubble_row(text, role, timestamp, self.messages_container)
 
         count = self.messages_layout.count()
         self.messages_layout.insertLayout(count - 1, wrapper)
 
-        # Scroll after the layout pass completes
-        QApplication.processEvents()
-        self._do_scroll()
+        # The timer fires after the pending layout pass, so the range is current
+        self._request_scroll()
 
         return bubble
 
+    def add_messages(self, messages: list[tuple[str, str, str]]):
+        """
+        Append many ``(text, role, timestamp)`` bubbles with a single repaint.
+        The rows are laid out in one block that enters the message list as a
+        single item, so a long history costs one outer relayout, not one per row.
+        """
+        if not messages:
+            return
+        self.messages_container.setUpdatesEnabled(False)
+        try:
+            block = QWidget(self.messages_container)
+            block_layout = QVBoxLayout(block)
+            block_layout.setContentsMargins(0, 0, 0, 0)
+            block_layout.setSpacing(self.messages_layout.spacing())
+            for text, role, timestamp in messages:
+                block_layout.addLayout(self._bubble_row(text, role, timestamp, block)[1])
+
+            self.messages_layout.insertWidget(self.messages_layout.count() - 1, block)
+            self._request_scroll()
+        finally:
+            self.messages_container.setUpdatesEnabled(True)
+
     def start_streaming(self) -> MessageBubble:
         """Create an empty assistant bubble to stream tokens into."""
+        self._stream_buffer = []
+        self._stream_dirty = False
         self._streaming_bubble = self.add_message("", role="assistant")
         return self._streaming_bubble
 
     def append_token(self, token: str):
         if self._streaming_bubble:
-            current = self._streaming_bubble.text_label.text()
-            self._streaming_bubble.update_text(current + token)
+            self._stream_buffer.append(token)
+            self._stream_dirty = True
             self._request_scroll()
 
     def finish_streaming(self):
+        self._flush_stream_text()
         self._streaming_bubble = None
+        self._stream_buffer = []
 
     def show_thinking(self):
         if self._streaming_bubble:
+            self._stream_buffer = []
+            self._stream_dirty = False
             self._streaming_bubble.update_text("🤔 Thinking...")
 
     def clear_thinking(self):
         if self._streaming_bubble:
+            self._stream_buffer = []
+            self._stream_dirty = False
             self._streaming_bubble.update_text("")
 
     def clear_messages(self):
@@ -4,35 +4,70 @@ Wires UI components to the backend engine.
 """
 
 import os
+import uuid
 import logging
 from datetime import datetime
+from typing import Optional
 
 from PyQt5.QtWidgets import (
     QMainWindow, QSplitter, QWidget, QVBoxLayout, QAction,
     QMessageBox, QStatusBar, QApplication, QLabel
 )
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QIcon
 
 from ui.chat_widget import ChatWidget
 from ui.sidebar import Sidebar
-from ui.settings_dialog import SettingsDialog
-from ui.resource_monitor import ResourceMonitor
-from ui.styles import DARK_THEME, LIGHT_THEME
+from ui.styles import get_theme
 from core.config_manager import ConfigManager
 from core.llm_engine import OllamaEngine, GenerateWorker
 from core.database import Database
+from core.persistence_worker import PersistenceWorker
+from core.response_cache import ResponseCache, normalize_prompt
 from core.gpu_detector import GPUDetector
 
-# Heavy deps loaded lazily so the window appears fast
-MemoryManager = None
 
+class MemoryLoader(QThread):
+    """
+    Imports torch/FAISS and loads the embedding model off the GUI thread.
+    core.memory is imported only here, never from the GUI thread.
+    """
 
-def _load_memory():
-    global MemoryManager
-    if MemoryManager is None:
-        from core.memory import MemoryManager as _MM
-        MemoryManager = _MM
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def run(self):
+        try:
+            from core.memory import MemoryManager
+
+            memory = MemoryManager()
+            memory.warm_up()
+        except Exception as exc:
+            self.failed.emit(str(exc))
+            return
+        self.loaded.emit(memory)
+
+
+class OllamaConnector(QThread):
+    """
+    Connects to (or starts) Ollama and fetches the model list off the GUI
+    thread; starting the server can take seconds of polling.
+    """
+
+    connected = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, engine: OllamaEngine):
+        super().__init__()
+        self._engine = engine
+
+    def run(self):
+        try:
+            self._engine.connect()
+        except RuntimeError as exc:
+            self.failed.emit(str(exc))
+            return
+        self.connected.emit(self._engine.list_models())
 
 
 _PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -58,26 +93,64 @@ class MainWindow(QMainWindow):
         # Backend objects
         self.config = ConfigManager()
         self.db = Database()
+        self.db.start_maintenance()
+        # All database and memory traffic from the UI goes through this worker
+        self.persistence = PersistenceWorker(self.db)
+        self.persistence.op_failed.connect(self._on_persistence_failed)
+        self.persistence.start()
+        # Used on the persistence worker only
+        self.response_cache = ResponseCache(self.db)
+        # (key, memories, prompt, top_k) of the turn being generated, for
+        # caching its reply
+        self._cache_turn: Optional[tuple[str, list[str], str, int]] = None
+        # Probed from showEvent: nvidia-smi / WMI can take a while
         self.gpu_detector = GPUDetector()
-        self.gpu_detector.detect()
         self.llm = OllamaEngine()
         self.memory = None
+        self._memory_loader = None
+        self._ollama_connector = None
         self._current_conv_id = None
-        self._worker = None
-
+        # id -> row as last shown in the sidebar; patched per turn, not re-queried
+        self._convs_cache: dict[str, dict] = {}
+        self._shown_once = False
+        self.resource_monitor = None
+
+        self._current_theme: Optional[str] = None
+        # The one config read made before the first paint, deliberately: a
+        # saved light theme applied after it would flash the dark one first
         self._apply_theme(self.config.get("theme", "dark"))
 
         self._setup_ui()
         self._setup_menu()
         self._setup_statusbar()
 
-        # Defer heavy init so the window paints immediately
-        QTimer.singleShot(500, self._connect_ollama)
-        QTimer.singleShot(1000, self._init_memory)
+        # One generation thread and event loop for the whole session
+        self.generator = GenerateWorker(self.llm)
+        self.generator.token_received.connect(self.chat.append_token)
+        self.generator.thinking_started.connect(self._on_thinking_started)
+        self.generator.thinking_finished.connect(self._on_thinking_finished)
+        self.generator.generation_complete.connect(self._on_generation_complete)
+        self.generator.error_occurred.connect(self._on_generation_error)
+        self.generator.start()
 
         self._refresh_conversations()
         log.info("Application started")
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._shown_once:
+            return
+        self._shown_once = True
+        # Queued from the first show, so the window has painted before any of
+        # this runs
+        QTimer.singleShot(0, self._setup_resource_monitor)
+        # The loader thread does its work off the GUI thread, so start it
+        # right away and have RAG ready as early as possible; chat works
+        # without it until then
+        QTimer.singleShot(0, self._init_memory)
+        QTimer.singleShot(200, self.gpu_detector.detect)
+        QTimer.singleShot(500, self._connect_ollama)
+
     # ------------------------------------------------------------------ #
     #  UI Setup                                                           #
     # ------------------------------------------------------------------ #
@@ -146,65 +219,96 @@ class MainWindow(QMainWindow):
         spacer.setFixedWidth(20)
         self.status_bar.addWidget(spacer)
 
+    def _setup_resource_monitor(self):
+        # psutil is imported with the widget, off the pre-paint path
+        from ui.resource_monitor import ResourceMonitor
         self.resource_monitor = ResourceMonitor(self.gpu_detector)
         self.status_bar.addPermanentWidget(self.resource_monitor)
 
     def _apply_theme(self, theme: str):
-        if theme == "light":
-            QApplication.instance().setStyleSheet(LIGHT_THEME)
-        else:
-            QApplication.instance().setStyleSheet(DARK_THEME)
+        theme = "light" if theme == "light" else "dark"
+        # Setting the sheet re-polishes every widget; skip it when nothing changes
+        if theme == self._current_theme:
+            return
+        self._current_theme = theme
+        QApplication.instance().setStyleSheet(get_theme(theme))
 
     # ------------------------------------------------------------------ #
     #  Backend init                                                       #
     # ------------------------------------------------------------------ #
 
     def _connect_ollama(self):
-        try:
-            self.llm.connect()
-            models = self.llm.list_models()
-            if models:
-                self.sidebar.set_models(models)
-
-                # Use configured model if available, otherwise take the first one
-                model = self.config.get("model", "llama3.2")
-                available = [m["name"] for m in models]
-                if model not in available:
-                    model = available[0]
-                    self.config.set("model", model)
-
-                self.llm.set_model(model)
-                self.llm.set_options(
-                    context_window=self.config.get("context_window", 4096),
-                    temperature=self.config.get("temperature", 0.7),
-                )
-                self.sidebar.set_current_model(model)
-                self.model_status.setText(f"✅ Model: {model}")
-            else:
-                self.model_status.setText("⚠ No models found — run: ollama pull llama3.2")
-
-            log.info("Connected to Ollama, model=%s", self.llm.current_model)
-        except RuntimeError as exc:
-            self.model_status.setText("❌ Ollama not connected")
-            log.error("Ollama connection failed: %s", exc)
-            QMessageBox.warning(
-                self,
-                "Ollama Not Found",
-                f"Could not connect to Ollama.\n\n{exc}\n\n"
-                "Please run setup.bat first, or install Ollama from ollama.com",
+        self._ollama_connector = OllamaConnector(self.llm)
+        self._ollama_connector.connected.connect(self._on_ollama_connected)
+        self._ollama_connector.failed.connect(self._on_ollama_failed)
+        self._ollama_connector.start()
+
+    def _on_ollama_connected(self, models: list[dict]):
+        self._ollama_connector = None
+        if models:
+            self.sidebar.set_models(models)
+
+            # Use configured model if available, otherwise take the first one
+            model = self.config.get("model", "llama3.2")
+            available = [m["name"] for m in models]
+            if model not in available:
+                model = available[0]
+                self.config.set("model", model)
+
+            self.llm.set_model(model)
+            self.llm.set_options(
+                context_window=self.config.get("context_window", 4096),
+                temperature=self.config.get("temperature", 0.7),
             )
+            self.sidebar.set_current_model(model)
+            self.model_status.setText(f"✅ Model: {model}")
+        else:
+            self.model_status.setText("⚠ No models found — run: ollama pull llama3.2")
+
+        log.info("Connected to Ollama, model=%s", self.llm.current_model)
+
+    def _on_ollama_failed(self, error: str):
+        self._ollama_connector = None
+        self.model_status.setText("❌ Ollama not connected")
+        log.error("Ollama connection failed: %s", error)
+        QMessageBox.warning(
+            self,
+            "Ollama Not Found",
+            f"Could not connect to Ollama.\n\n{error}\n\n"
+            "Please run setup.bat first, or install Ollama from ollama.com",
+        )
+
+    def _on_persistence_failed(self, error: str):
+        log.error("Persistence operation failed: %s", error)
+        # Ops and their writes run in the background; say so when one is lost
+        self.status_bar.showMessage(f"⚠ Not saved: {error}", 8000)
 
     def _init_memory(self):
-        """Load the RAG memory system (deferred because it pulls in torch + transformers)."""
-        try:
-            _load_memory()
-            self.memory = MemoryManager()
-            stats = self.memory.get_stats()
-            self.sidebar.update_memory_stats(stats["total_memories"])
-            log.info("Memory system ready (%d entries)", stats["total_memories"])
-        except Exception as exc:
-            log.error("Memory init failed: %s", exc)
-            self.memory = None
+        """Load the RAG memory system (in the background: it pulls in torch + transformers)."""
+        self.sidebar.set_memory_status("warming up…")
+        self._memory_loader = MemoryLoader()
+        self._memory_loader.loaded.connect(self._on_memory_loaded)
+        self._memory_loader.failed.connect(self._on_memory_failed)
+        self._memory_loader.start()
+
+    def _on_memory_loaded(self, memory):
+        # Kept only for shutdown; everything else reaches it via the worker
+        self.memory = memory
+        self._memory_loader = None
+        self.persistence.set_memory(memory)
+        self.persistence.submit_memory(
+            lambda mem: mem.get_stats()["total_memories"], self._on_memory_ready
+        )
+
+    def _on_memory_ready(self, total: int):
+        self.sidebar.update_memory_stats(total)
+        log.info("Memory system ready (%d entries)", total)
+
+    def _on_memory_failed(self, error: str):
+        log.error("Memory init failed: %s", error)
+        self.memory = None
+        self._memory_loader = None
+        self.sidebar.set_memory_status("unavailable")
 
     # ------------------------------------------------------------------ #
     #  Chat                                                               #
@@ -214,55 +318,146 @@ class MainWindow(QMainWindow):
         self._current_conv_id = None
         self.chat.clear_messages()
         self.chat.show_welcome()
-        self.sidebar.history_list.clearSelection()
+        self.sidebar.clear_selection()
 
     def _on_user_message(self, text: str):
-        if self._current_conv_id is None:
-            self._current_conv_id = self.db.create_conversation()
-            self.db.auto_title_conversation(self._current_conv_id, text)
-            self._refresh_conversations()
-
         self.chat.add_message(text, role="user")
 
-        msg_id = self.db.add_message(self._current_conv_id, "user", text)
+        if self._current_conv_id is None:
+            # Only queued, never waited on; the id is needed right away and the
+            # writer's linger folds this into the same commit as the message
+            with self.db.transaction():
+                conv_id = self.db.create_conversation()
+                title = self.db.auto_title_conversation(conv_id, text)
+            self._current_conv_id = conv_id
+            now = datetime.now().isoformat()
+            self._upsert_conversation({
+                "id": conv_id, "title": title, "created_at": now, "updated_at": now,
+            })
+            self.sidebar.select_conversation(conv_id)
+
+        # The user message is stored by the reply's own op, after its memory
+        # context is retrieved; see _prepare_reply()
+        self._generate_response(text)
+
+    def _store_message(self, role: str, text: str, index: bool = True):
+        """Persist and (with *index*) embed a chat message on the persistence worker."""
+        conv_id = self._current_conv_id
+        self.persistence.submit(
+            lambda db: self._write_message(db, conv_id, role, text, index),
+            lambda total: self._on_message_stored(role, total),
+        )
 
-        if self.memory:
+    def _write_message(
+        self, db: Database, conv_id: str, role: str, text: str, index: bool = True,
+    ):
+        """
+        Runs on the persistence worker. The message is indexed in memory first
+        so its embedding id goes into the INSERT itself, with no follow-up
+        UPDATE. Returns the memory count, or None if it wasn't indexed.
+        """
+        memory = self.persistence.memory
+        msg_id = str(uuid.uuid4())
+        emb_id = -1
+        if memory is not None and index:
             try:
-                emb_id = self.memory.add_to_memory(
+                emb_id = memory.add_to_memory(
                     text,
                     message_id=msg_id,
-                    conversation_id=self._current_conv_id,
+                    conversation_id=conv_id,
                     timestamp=datetime.now().isoformat(),
                 )
-                self.db.update_message_embedding(msg_id, emb_id)
             except Exception as exc:
-                log.warning("Memory store failed for user msg: %s", exc)
+                log.warning("Memory store failed for %s msg: %s", role, exc)
+        db.add_message(conv_id, role, text, embedding_id=emb_id, msg_id=msg_id)
+        return memory.get_stats()["total_memories"] if emb_id >= 0 else None
 
-        self._generate_response(text)
+    def _on_message_stored(self, role: str, total):
+        if role == "assistant" and total is not None:
+            self.sidebar.update_memory_stats(total)
 
     def _generate_response(self, user_text: str):
         self.chat.set_input_enabled(False)
+        model = self.llm.current_model
+        system_prompt = self.config.get("system_prompt", "")
+        top_k = self.config.get("max_memory_results", 5) if self.memory else 0
+        use_cache = self.config.get("response_cache", True)
+        conv_id = self._current_conv_id
+        self.persistence.submit(
+            lambda db: self._prepare_reply(
+                db, conv_id, user_text, model, system_prompt, top_k, use_cache,
+            ),
+            lambda prepared: self._on_reply_prepared(user_text, top_k, *prepared),
+        )
 
-        context = ""
-        if self.memory:
+    def _prepare_reply(
+        self, db: Database, conv_id: str, user_text: str, model: str,
+        system_prompt: str, top_k: int, use_cache: bool,
+    ) -> tuple[Optional[str], list[str], str, Optional[str]]:
+        """
+        Runs on the persistence worker. Retrieves memories for the prompt,
+        looks it up in the response cache, then stores the user message.
+        Returns ``(cached reply, memories, memory context, cache key)``; the
+        reply is None on a miss, the key None with the cache turned off.
+        """
+        memory = self.persistence.memory
+        memories, context = [], ""
+        if memory is not None and top_k:
+            memories = self._retrieve_memories(memory, user_text, top_k)
+            context = memory.format_context(memories[:top_k])
+        cached = key = None
+        if use_cache:
+            key = ResponseCache.key_for(model, system_prompt, user_text)
             try:
-                context = self.memory.build_context(
-                    user_text,
-                    top_k=self.config.get("max_memory_results", 5),
-                )
+                cached = self.response_cache.lookup(key, memories, user_text, top_k)
             except Exception as exc:
-                log.warning("Memory retrieval failed: %s", exc)
+                log.warning("Response cache lookup failed: %s", exc)
+        # Stored only now, so this turn is never its own context. A replayed
+        # turn stays out of memory: it adds nothing new to retrieve
+        self._write_message(db, conv_id, "user", user_text, index=cached is None)
+        return cached, memories, context, key
+
+    @staticmethod
+    def _retrieve_memories(memory, user_text: str, top_k: int) -> list[str]:
+        """
+        Distinct memory texts for *user_text*, best first. Earlier copies of
+        the prompt itself are skipped, and twice *top_k* are fetched so the
+        reply cache can still fill *top_k* once it drops the cached reply.
+        """
+        try:
+            results = memory.retrieve(user_text, top_k=2 * top_k)
+        except Exception as exc:
+            log.warning("Memory retrieval failed: %s", exc)
+            return []
+        seen = {normalize_prompt(user_text)}
+        memories = []
+        for result in results:
+            normalized = normalize_prompt(result["text"])
+            if normalized not in seen:
+                seen.add(normalized)
+                memories.append(result["text"])
+        return memories
+
+    def _on_reply_prepared(
+        self, user_text: str, top_k: int, cached: Optional[str], memories: list[str],
+        context: str, cache_key: Optional[str],
+    ):
+        if cached is not None:
+            # Replayed through the normal completion path, minus the LLM call
+            self._cache_turn = None
+            self.chat.start_streaming()
+            self.chat.append_token(cached)
+            self._on_generation_complete(cached, replayed=True)
+            return
+        if cache_key is not None:
+            self._cache_turn = (cache_key, memories, user_text, top_k)
+        self._start_generation(user_text, context)
 
+    def _start_generation(self, user_text: str, context: str):
         self.chat.start_streaming()
 
         system_prompt = self.config.get("system_prompt", "")
-        self._worker = GenerateWorker(self.llm, user_text, context, system_prompt)
-        self._worker.token_received.connect(self.chat.append_token)
-        self._worker.thinking_started.connect(self._on_thinking_started)
-        self._worker.thinking_finished.connect(self._on_thinking_finished)
-        self._worker.generation_complete.connect(self._on_generation_complete)
-        self._worker.error_occurred.connect(self._on_generation_error)
-        self._worker.start()
+        self.generator.submit(user_text, context, system_prompt)
 
     def _on_thinking_started(self):
         self.chat.show_thinking()
@@ -270,37 +465,27 @@ class MainWindow(QMainWindow):
     def _on_thinking_finished(self):
         self.chat.clear_thinking()
 
-    def _on_generation_complete(self, full_response: str):
+    def _on_generation_complete(self, full_response: str, replayed: bool = False):
         self.chat.finish_streaming()
         self.chat.set_input_enabled(True)
 
-        if self._current_conv_id and full_response:
-            msg_id = self.db.add_message(
-                self._current_conv_id, "assistant", full_response
+        cache_turn, self._cache_turn = self._cache_turn, None
+        if cache_turn is not None and full_response:
+            key, memories, user_text, top_k = cache_turn
+            self.persistence.submit(
+                lambda db: self.response_cache.store(key, full_response, memories, user_text, top_k)
             )
-            if self.memory:
-                try:
-                    emb_id = self.memory.add_to_memory(
-                        full_response,
-                        message_id=msg_id,
-                        conversation_id=self._current_conv_id,
-                        timestamp=datetime.now().isoformat(),
-                    )
-                    self.db.update_message_embedding(msg_id, emb_id)
-                    stats = self.memory.get_stats()
-                    self.sidebar.update_memory_stats(stats["total_memories"])
-                except Exception as exc:
-                    log.warning("Memory store failed for assistant msg: %s", exc)
 
-        self._refresh_conversations()
-        self._worker = None
+        if self._current_conv_id and full_response:
+            self._store_message("assistant", full_response, index=not replayed)
+            self._touch_conversation(self._current_conv_id)
 
     def _on_generation_error(self, error: str):
+        self._cache_turn = None
         self.chat.finish_streaming()
         self.chat.set_input_enabled(True)
         self.chat.add_message(f"⚠ Error: {error}", role="assistant")
         log.error("Generation error: %s", error)
-        self._worker = None
 
     # ------------------------------------------------------------------ #
     #  Conversation management                                            #
@@ -310,10 +495,18 @@ class MainWindow(QMainWindow):
         self._current_conv_id = conv_id
         self.chat.clear_messages()
 
-        messages = self.db.get_messages(conv_id)
-        for msg in messages:
-            ts = msg.get("timestamp", "")[:16].replace("T", " ")
-            self.chat.add_message(msg["content"], role=msg["role"], timestamp=ts)
+        self.persistence.submit(
+            lambda db: db.get_messages(conv_id),
+            lambda messages: self._show_messages(conv_id, messages),
+        )
+
+    def _show_messages(self, conv_id: str, messages: list[dict]):
+        if conv_id != self._current_conv_id:
+            return  # another conversation was opened in the meantime
+        self.chat.add_messages([
+            (msg["content"], msg["role"], msg.get("timestamp", "")[:16].replace("T", " "))
+            for msg in messages
+        ])
 
     def _delete_conversation(self, conv_id: str):
         reply = QMessageBox.question(
@@ -322,25 +515,44 @@ class MainWindow(QMainWindow):
             QMessageBox.Yes | QMessageBox.No, QMessageBox.No,
         )
         if reply == QMessageBox.Yes:
-            self.db.delete_conversation(conv_id)
+            self.persistence.submit(lambda db: db.delete_conversation(conv_id))
             if self._current_conv_id == conv_id:
                 self._new_chat()
-            self._refresh_conversations()
+            self._convs_cache.pop(conv_id, None)
+            self.sidebar.remove_conversation(conv_id)
 
     def _refresh_conversations(self):
-        convs = self.db.get_conversations()
+        """Full reload of the sidebar list; only needed at startup and after a search."""
+        self.persistence.submit(lambda db: db.get_conversations(), self._show_conversations)
+
+    def _show_conversations(self, convs: list[dict]):
+        self._convs_cache = {conv["id"]: conv for conv in convs}
         self.sidebar.set_conversations(convs)
         if self._current_conv_id:
             self.sidebar.select_conversation(self._current_conv_id)
 
+    def _upsert_conversation(self, conv: dict):
+        self._convs_cache[conv["id"]] = conv
+        # Search results stay as they are; the cache catches up for the next reload
+        if not self.sidebar.search_input.text().strip():
+            self.sidebar.upsert_conversation(conv)
+
+    def _touch_conversation(self, conv_id: str):
+        conv = self._convs_cache.get(conv_id)
+        if conv is not None:
+            self._upsert_conversation({**conv, "updated_at": datetime.now().isoformat()})
+
     def _search_conversations(self, query: str):
         if query.strip():
-            convs = self.db.search_conversations(query)
+            self.persistence.submit(
+                lambda db: db.search_conversations(query), self.sidebar.set_conversations
+            )
         else:
-            convs = self.db.get_conversations()
-        self.sidebar.set_conversations(convs)
+            self._refresh_conversations()
 
     def _change_model(self, model_name: str):
+        if model_name == self.llm.current_model:
+            return  # re-selected the active model; nothing to reload or save
         self.llm.set_model(model_name)
         self.llm.set_options(
             context_window=self.config.get("context_window", 4096),
@@ -355,6 +567,8 @@ class MainWindow(QMainWindow):
     # ------------------------------------------------------------------ #
 
     def _open_settings(self):
+        # Imported on first use; most sessions never open the dialog
+        from ui.settings_dialog import SettingsDialog
         dialog = SettingsDialog(
             self.config.get_all(),
             self.gpu_detector.get_gpu_info(),
@@ -365,9 +579,12 @@ class MainWindow(QMainWindow):
 
     def _apply_settings(self, settings: dict):
         if settings.get("action") == "clear_memory":
-            if self.memory:
-                self.memory.clear_all()
-                self.sidebar.update_memory_stats(0)
+            # Cached replies were written with the cleared memories as context
+            self.persistence.submit(lambda db: self.response_cache.clear())
+            self.persistence.submit_memory(
+                lambda mem: mem.clear_all(),
+                lambda _: self.sidebar.update_memory_stats(0),
+            )
             return
 
         if settings.get("action") == "reset":
@@ -375,13 +592,17 @@ class MainWindow(QMainWindow):
             self._apply_theme("dark")
             return
 
-        for key, value in settings.items():
+        # The dialog sends every field; only act on the ones that changed
+        changed = {
+            key: value for key, value in settings.items() if self.config.get(key) != value
+        }
+        for key, value in changed.items():
             self.config.set(key, value)
 
-        if "theme" in settings:
-            self._apply_theme(settings["theme"])
+        if "theme" in changed:
+            self._apply_theme(changed["theme"])
 
-        if "context_window" in settings or "temperature" in settings:
+        if "context_window" in changed or "temperature" in changed:
             self.llm.set_options(
                 context_window=self.config.get("context_window", 4096),
                 temperature=self.config.get("temperature", 0.7),
@@ -408,10 +629,18 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         log.info("Shutting down")
-        if self._worker and self._worker.isRunning():
-            self._worker.terminate()
-            self._worker.wait(2000)
+        self.generator.stop()
+        if self._ollama_connector and self._ollama_connector.isRunning():
+            self._ollama_connector.wait(5000)
+        if self._memory_loader and self._memory_loader.isRunning():
+            self._memory_loader.wait(5000)
         if self.resource_monitor:
             self.resource_monitor.stop()
+        self.gpu_detector.shutdown()
+        self.config.flush()
+        # Drain queued ops before memory is flushed on this thread
+        self.persistence.stop()
+        if self.memory:
+            self.memory.close()
         self.db.close()
         event.accept()
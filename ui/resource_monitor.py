@@ -18,6 +18,10 @@ class ResourceMonitor(QFrame):
         super().__init__(parent)
         self.setObjectName("resource_frame")
         self.gpu_detector = gpu_detector
+        # Fixed for the session; only usage is read per tick
+        self._ram_total_gb = psutil.virtual_memory().total / (1024 ** 3)
+        # The first interval=0 call has no baseline and always returns 0.0
+        psutil.cpu_percent(interval=0)
         self._setup_ui()
         self._start_timer()
 
@@ -61,10 +65,13 @@ class ResourceMonitor(QFrame):
     def _start_timer(self):
         self.timer = QTimer(self)
         self.timer.timeout.connect(self._update_stats)
+        # First reading comes one interval in, never during construction
         self.timer.start(self.REFRESH_MS)
-        self._update_stats()
 
     def _update_stats(self):
+        # Nobody is looking: skip the psutil/NVML reads entirely
+        if not self.isVisible() or self.window().isMinimized():
+            return
         try:
             cpu_pct = psutil.cpu_percent(interval=0)
             self.cpu_label.setText(f"CPU: {cpu_pct:.0f}%")
@@ -72,11 +79,11 @@ class ResourceMonitor(QFrame):
 
             ram = psutil.virtual_memory()
             ram_used_gb = ram.used / (1024 ** 3)
-            ram_total_gb = ram.total / (1024 ** 3)
-            self.ram_label.setText(f"RAM: {ram_used_gb:.1f}/{ram_total_gb:.0f}GB")
+            self.ram_label.setText(f"RAM: {ram_used_gb:.1f}/{self._ram_total_gb:.0f}GB")
             self.ram_bar.setValue(int(ram.percent))
 
-            if self.gpu_detector:
+            # GPU probing waits for the window's deferred detect()
+            if self.gpu_detector and self.gpu_detector.is_detected:
                 gpu_stats = self.gpu_detector.get_live_nvidia_stats()
                 if gpu_stats:
                     util = gpu_stats["utilization_pct"]
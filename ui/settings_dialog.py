@@ -6,7 +6,7 @@ Theme, model parameters, GPU info, and memory management.
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QTabWidget, QWidget,
     QLabel, QComboBox, QSlider, QSpinBox, QDoubleSpinBox,
-    QPushButton, QGroupBox, QFormLayout, QMessageBox, QTextEdit
+    QPushButton, QGroupBox, QFormLayout, QMessageBox, QTextEdit, QCheckBox,
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 
@@ -77,7 +77,7 @@ class SettingsDialog(QDialog):
         layout.addRow("Temperature:", self.temp_slider)
 
         temp_hint = QLabel("Lower = more focused, Higher = more creative")
-        temp_hint.setStyleSheet("font-size: 11px; color: #888;")
+        temp_hint.setObjectName("hint_label")
         layout.addRow("", temp_hint)
 
         self.ctx_spin = QSpinBox()
@@ -91,6 +91,14 @@ class SettingsDialog(QDialog):
         self.memory_k_spin.setValue(self.config.get("max_memory_results", 5))
         layout.addRow("Memory Results (RAG):", self.memory_k_spin)
 
+        self.response_cache_check = QCheckBox("Replay replies to repeated prompts")
+        self.response_cache_check.setChecked(self.config.get("response_cache", True))
+        layout.addRow("Response Cache:", self.response_cache_check)
+
+        cache_hint = QLabel("Only exact repeats with the same model, prompt and memories")
+        cache_hint.setObjectName("hint_label")
+        layout.addRow("", cache_hint)
+
         self.system_prompt_edit = QTextEdit()
         self.system_prompt_edit.setPlainText(self.config.get("system_prompt", ""))
         self.system_prompt_edit.setMaximumHeight(100)
@@ -146,7 +154,7 @@ class SettingsDialog(QDialog):
         layout.addRow("Auto-prune (days):", self.prune_spin)
 
         prune_hint = QLabel("Set to 0 to keep all memories forever")
-        prune_hint.setStyleSheet("font-size: 11px; color: #888;")
+        prune_hint.setObjectName("hint_label")
         layout.addRow("", prune_hint)
 
         clear_btn = QPushButton("🗑  Clear All Memories")
@@ -184,6 +192,7 @@ class SettingsDialog(QDialog):
             "temperature": self.temp_slider.value(),
             "context_window": self.ctx_spin.value(),
             "max_memory_results": self.memory_k_spin.value(),
+            "response_cache": self.response_cache_check.isChecked(),
             "auto_prune_days": self.prune_spin.value(),
             "system_prompt": self.system_prompt_edit.toPlainText(),
         }
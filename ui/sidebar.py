@@ -3,12 +3,278 @@ KOMALAM Sidebar
 Conversation history, search, model selector.
 """
 
+import os
+from typing import Optional
+
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QLineEdit, QListWidget, QListWidgetItem, QComboBox, QFrame,
-    QSizePolicy, QMenu, QAction
+    QLineEdit, QListView, QComboBox, QFrame,
+    QSizePolicy, QMenu, QAction, QApplication, QStyle,
+    QStyledItemDelegate, QStyleOptionViewItem,
+)
+from PyQt5.QtCore import (
+    Qt, pyqtSignal, pyqtProperty, QTimer, QAbstractListModel, QModelIndex,
+    QEvent, QSize,
 )
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QIcon, QStaticText
+
+# Glyphs are SVG icons rather than emoji in the text, so painting a button
+# or label never goes through the (slow) emoji font fallback
+ICONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "icons")
+
+
+def _icon(name: str) -> QIcon:
+    return QIcon(os.path.join(ICONS_DIR, f"{name}.svg"))
+
+
+class ConversationModel(QAbstractListModel):
+    """
+    Conversation rows as plain dicts. The view only asks for the rows it
+    paints, so a long history costs no per-row widgets or items.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[dict] = []
+        # conv id -> row, rebuilt after every structural change
+        self._index: dict[str, int] = {}
+        # conv id -> display text, built on first paint and dropped when the row changes
+        self._texts: dict[str, str] = {}
+
+    @staticmethod
+    def _item_text(conv: dict) -> str:
+        title = conv.get("title", "New Chat")
+        updated = conv.get("updated_at", "")[:10]
+        return f"{title}\n{updated}"
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        # Called per role for every painted row; read the row and list once
+        row, rows = index.row(), self._rows
+        if not index.isValid() or not 0 <= row < len(rows):
+            return None
+        conv = rows[row]
+        if role == Qt.DisplayRole:
+            text = self._texts.get(conv["id"])
+            if text is None:
+                text = self._texts[conv["id"]] = self._item_text(conv)
+            return text
+        if role == Qt.UserRole:
+            return conv["id"]
+        return None
+
+    def _reindex(self):
+        self._index = {conv["id"]: row for row, conv in enumerate(self._rows)}
+
+    def set_rows(self, conversations: list[dict]):
+        """
+        Replace the rows with *conversations*, touching only what differs:
+        vanished rows are removed, the rest moved or inserted into place, and
+        rows whose data changed are updated in place. A list sharing nothing
+        with the current one (e.g. search results) is a plain reset.
+        """
+        new = list(conversations)
+        new_ids = {conv["id"] for conv in new}
+        if not new_ids & self._index.keys():
+            self.beginResetModel()
+            self._rows = new
+            self._texts.clear()
+            self._reindex()
+            self.endResetModel()
+            return
+
+        # Bottom-up, so the rows still to visit keep their numbers; each
+        # contiguous run of vanished rows goes out as one removal
+        end = len(self._rows)
+        while end > 0:
+            if self._rows[end - 1]["id"] in new_ids:
+                end -= 1
+                continue
+            start = end - 1
+            while start > 0 and self._rows[start - 1]["id"] not in new_ids:
+                start -= 1
+            self.beginRemoveRows(QModelIndex(), start, end - 1)
+            for conv in self._rows[start:end]:
+                self._texts.pop(conv["id"], None)
+            del self._rows[start:end]
+            self.endRemoveRows()
+            end = start
+
+        rows = self._rows
+        kept_ids = {conv["id"] for conv in rows}
+        row = 0
+        while row < len(new):
+            conv = new[row]
+            if conv["id"] not in kept_ids:
+                # A run of new conversations is inserted in one go
+                run_end = row + 1
+                while run_end < len(new) and new[run_end]["id"] not in kept_ids:
+                    run_end += 1
+                self.beginInsertRows(QModelIndex(), row, run_end - 1)
+                rows[row:row] = new[row:run_end]
+                self.endInsertRows()
+                row = run_end
+                continue
+            if rows[row]["id"] != conv["id"]:
+                # Rows above *row* are settled, so the old position is below it
+                old = next(
+                    r for r in range(row + 1, len(rows))
+                    if rows[r]["id"] == conv["id"]
+                )
+                self.beginMoveRows(QModelIndex(), old, old, QModelIndex(), row)
+                rows.insert(row, rows.pop(old))
+                self.endMoveRows()
+            if rows[row] != conv:
+                rows[row] = conv
+                self._texts.pop(conv["id"], None)
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DisplayRole])
+            row += 1
+        self._reindex()
+
+    def row_of(self, conv_id: str) -> int:
+        return self._index.get(conv_id, -1)
+
+    def upsert(self, conv: dict):
+        """Put *conv* at row 0, replacing (and moving) its existing row if any."""
+        row = self.row_of(conv["id"])
+        if row < 0:
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self._rows.insert(0, conv)
+            self._reindex()
+            self.endInsertRows()
+            return
+        if row > 0:
+            # Persistent indexes (the current row among them) follow the move
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), 0)
+            self._rows.insert(0, self._rows.pop(row))
+            self._reindex()
+            self.endMoveRows()
+        self._rows[0] = conv
+        self._texts.pop(conv["id"], None)
+        top = self.index(0)
+        self.dataChanged.emit(top, top, [Qt.DisplayRole])
+
+    def remove(self, conv_id: str):
+        row = self.row_of(conv_id)
+        if row >= 0:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self._texts.pop(conv_id, None)
+            del self._rows[row]
+            self._reindex()
+            self.endRemoveRows()
+
+
+class ConversationList(QListView):
+    """History view; the themes set its text colours for the delegate via qproperty-*."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._text_color = QColor("#c0c0d0")
+        self._selected_text_color = QColor("#ffffff")
+
+    def _get_text_color(self) -> QColor:
+        return self._text_color
+
+    def _set_text_color(self, color: QColor):
+        self._text_color = QColor(color)
+
+    def _get_selected_text_color(self) -> QColor:
+        return self._selected_text_color
+
+    def _set_selected_text_color(self, color: QColor):
+        self._selected_text_color = QColor(color)
+
+    textColor = pyqtProperty(QColor, _get_text_color, _set_text_color)
+    selectedTextColor = pyqtProperty(QColor, _get_selected_text_color, _set_selected_text_color)
+
+    def changeEvent(self, event):
+        # A new theme can change the item padding the row height was measured with
+        if event.type() == QEvent.StyleChange:
+            delegate = self.itemDelegate()
+            if isinstance(delegate, ConversationDelegate):
+                delegate.clear_size_cache()
+        super().changeEvent(event)
+
+
+class ConversationDelegate(QStyledItemDelegate):
+    """
+    Paints the two-line title/date rows from cached QStaticText, so glyph
+    layout happens once per distinct line instead of on every repaint. The
+    row frame (hover, selection, padding) still comes from the style sheet.
+    """
+
+    CACHE_LIMIT = 512
+    # Stands in for every row when measuring: a title line and a date line
+    _SIZE_SAMPLE = "Xg\u2028Xg"
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._static: dict[str, QStaticText] = {}
+        # font key -> row height; every row is two plain lines, so that is all it depends on
+        self._heights: dict[str, int] = {}
+
+    def clear_size_cache(self):
+        self._heights.clear()
+
+    def sizeHint(self, option, index):
+        # Width 0 lets the view stretch rows to the viewport, so the title
+        # elides at the visible edge instead of the first row's text width
+        key = option.font.key()
+        height = self._heights.get(key)
+        if height is None:
+            opt = QStyleOptionViewItem(option)
+            self.initStyleOption(opt, index)
+            opt.text = self._SIZE_SAMPLE
+            widget = opt.widget
+            style = widget.style() if widget is not None else QApplication.style()
+            height = style.sizeFromContents(QStyle.CT_ItemViewItem, opt, QSize(), widget).height()
+            self._heights[key] = height
+        return QSize(0, height)
+
+    def _static_text(self, text: str) -> QStaticText:
+        static = self._static.get(text)
+        if static is None:
+            if len(self._static) >= self.CACHE_LIMIT:
+                self._static.clear()
+            static = QStaticText(text)
+            static.setTextFormat(Qt.PlainText)
+            self._static[text] = static
+        return static
+
+    def paint(self, painter, option, index):
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        # opt.text has the newline swapped for U+2028; split the model's text
+        title, _, updated = (index.data(Qt.DisplayRole) or "").partition("\n")
+        opt.text = ""
+        widget = opt.widget
+        style = widget.style() if widget is not None else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, widget)
+
+        rect = style.subElementRect(QStyle.SE_ItemViewItemText, opt, widget)
+        # Same inset the default delegate gives item text
+        margin = style.pixelMetric(QStyle.PM_FocusFrameHMargin, None, widget) + 1
+        rect.adjust(margin, 0, -margin, 0)
+        metrics = opt.fontMetrics
+        title = metrics.elidedText(title, Qt.ElideRight, rect.width())
+        line = metrics.lineSpacing()
+        top = rect.top() + (rect.height() - 2 * line) // 2
+
+        selected = bool(opt.state & QStyle.State_Selected)
+        if isinstance(widget, ConversationList):
+            color = widget.selectedTextColor if selected else widget.textColor
+        else:
+            role = opt.palette.HighlightedText if selected else opt.palette.Text
+            color = opt.palette.color(role)
+        painter.save()
+        painter.setFont(opt.font)
+        painter.setPen(color)
+        painter.drawStaticText(rect.left(), top, self._static_text(title))
+        painter.drawStaticText(rect.left(), top + line, self._static_text(updated))
+        painter.restore()
 
 
 class Sidebar(QFrame):
@@ -20,11 +286,22 @@ class Sidebar(QFrame):
     model_changed = pyqtSignal(str)
     search_requested = pyqtSignal(str)
 
+    # Typing pauses this long before a search is sent, so a burst of
+    # keystrokes costs one query instead of one per key
+    SEARCH_DEBOUNCE_MS = 250
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setObjectName("sidebar")
         self.setMinimumWidth(260)
         self.setMaximumWidth(360)
+        # model name -> combo row, filled by set_models
+        self._model_index: dict[str, int] = {}
+        # Built on the first right-click and reused after that
+        self._context_menu: Optional[QMenu] = None
+        self._delete_action: Optional[QAction] = None
+        # The count memory_label shows; None while it shows a status text instead
+        self._memory_count: Optional[int] = None
         self._setup_ui()
 
     def _setup_ui(self):
@@ -32,12 +309,19 @@ class Sidebar(QFrame):
         layout.setContentsMargins(12, 16, 12, 12)
         layout.setSpacing(12)
 
-        brand = QLabel("🤖 KOMALAM")
+        brand_row = QHBoxLayout()
+        brand_row.setSpacing(4)
+        brand_row.addStretch()
+        brand_icon = QLabel()
+        brand_icon.setPixmap(_icon("brand").pixmap(24, 24))
+        brand_row.addWidget(brand_icon)
+        brand = QLabel("KOMALAM")
         brand.setObjectName("brand_title")
-        brand.setAlignment(Qt.AlignCenter)
-        layout.addWidget(brand)
+        brand_row.addWidget(brand)
+        brand_row.addStretch()
+        layout.addLayout(brand_row)
 
-        self.new_chat_btn = QPushButton("✦  New Chat")
+        self.new_chat_btn = QPushButton(_icon("new_chat"), "New Chat")
         self.new_chat_btn.setObjectName("new_chat_button")
         self.new_chat_btn.setCursor(Qt.PointingHandCursor)
         self.new_chat_btn.clicked.connect(self.new_chat_requested.emit)
@@ -50,7 +334,7 @@ class Sidebar(QFrame):
 
         self.model_combo = QComboBox()
         self.model_combo.setToolTip("Select AI model")
-        self.model_combo.currentTextChanged.connect(self._on_model_changed)
+        self.model_combo.currentIndexChanged.connect(self._on_model_changed)
         layout.addWidget(self.model_combo)
 
         # Search
@@ -59,19 +343,36 @@ class Sidebar(QFrame):
         layout.addWidget(search_label)
 
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("🔍 Search conversations...")
+        self.search_input.setPlaceholderText("Search conversations...")
+        self.search_input.addAction(_icon("search"), QLineEdit.LeadingPosition)
         self.search_input.textChanged.connect(self._on_search)
         layout.addWidget(self.search_input)
 
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._emit_search)
+
         # History
         history_label = QLabel("CONVERSATIONS")
         history_label.setObjectName("section_title")
         layout.addWidget(history_label)
 
-        self.history_list = QListWidget()
+        self.history_model = ConversationModel(self)
+        self.history_list = ConversationList()
+        self.history_list.setObjectName("history_list")
+        self.history_list.setItemDelegate(ConversationDelegate(self.history_list))
+        # Every row is a two-line title + date, so one size hint serves all
+        self.history_list.setUniformItemSizes(True)
+        # Lay rows out 50 at a time between events instead of all at once
+        self.history_list.setLayoutMode(QListView.Batched)
+        self.history_list.setBatchSize(50)
+        self.history_list.setResizeMode(QListView.Adjust)
+        self.history_list.setEditTriggers(QListView.NoEditTriggers)
+        self.history_list.setModel(self.history_model)
         self.history_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.history_list.customContextMenuRequested.connect(self._show_context_menu)
-        self.history_list.currentItemChanged.connect(self._on_item_selected)
+        self.history_list.selectionModel().currentChanged.connect(self._on_item_selected)
         layout.addWidget(self.history_list, stretch=1)
 
         self.memory_label = QLabel("Memory: 0 entries")
@@ -79,63 +380,129 @@ class Sidebar(QFrame):
         self.memory_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.memory_label)
 
-    def _on_model_changed(self, text):
-        if text:
-            # Strip size suffix, e.g. "llama3.2 (2.0GB)" -> "llama3.2"
-            model_name = text.split(" (")[0].strip()
+    def _on_model_changed(self, index: int):
+        # The bare model name rides along as item data; the text has the size
+        model_name = self.model_combo.itemData(index)
+        if model_name:
             self.model_changed.emit(model_name)
 
     def _on_search(self, text):
-        self.search_requested.emit(text)
+        if text.strip():
+            self._search_timer.start()  # restarts on every keystroke
+        else:
+            # Clearing the box restores the full list without waiting
+            self._search_timer.stop()
+            self.search_requested.emit(text)
+
+    def _emit_search(self):
+        self.search_requested.emit(self.search_input.text())
+
+    def set_search_delay(self, ms: int):
+        """Change how long typing must pause before a search is sent."""
+        self._search_timer.setInterval(ms)
 
-    def _on_item_selected(self, current, previous):
-        if current:
+    def _on_item_selected(self, current: QModelIndex, previous: QModelIndex):
+        if current.isValid():
             conv_id = current.data(Qt.UserRole)
             if conv_id:
                 self.conversation_selected.emit(conv_id)
 
     def _show_context_menu(self, position):
-        item = self.history_list.itemAt(position)
-        if not item:
+        index = self.history_list.indexAt(position)
+        if not index.isValid():
             return
-        conv_id = item.data(Qt.UserRole)
-        menu = QMenu(self)
-        delete_action = QAction("🗑  Delete Conversation", self)
-        delete_action.triggered.connect(lambda: self.conversation_delete_requested.emit(conv_id))
-        menu.addAction(delete_action)
-        menu.exec_(self.history_list.mapToGlobal(position))
+        conv_id = index.data(Qt.UserRole)
+        if self._context_menu is None:
+            self._context_menu = QMenu(self)
+            self._delete_action = QAction(
+                _icon("delete"), "Delete Conversation", self._context_menu
+            )
+            self._context_menu.addAction(self._delete_action)
+        # exec_() reports the chosen action, so no per-click slot is needed
+        chosen = self._context_menu.exec_(self.history_list.mapToGlobal(position))
+        if chosen is self._delete_action:
+            self.conversation_delete_requested.emit(conv_id)
 
     def set_models(self, models: list[dict]):
+        # One repaint for the whole refill, not one per added item
+        self.model_combo.setUpdatesEnabled(False)
         self.model_combo.blockSignals(True)
-        self.model_combo.clear()
-        for m in models:
-            display = f"{m['name']} ({m['size']})" if m.get("size") else m["name"]
-            self.model_combo.addItem(display)
-        self.model_combo.blockSignals(False)
+        try:
+            self.model_combo.clear()
+            self._model_index = {}
+            for m in models:
+                display = f"{m['name']} ({m['size']})" if m.get("size") else m["name"]
+                self._model_index[m["name"]] = self.model_combo.count()
+                self.model_combo.addItem(display, m["name"])
+        finally:
+            self.model_combo.blockSignals(False)
+            self.model_combo.setUpdatesEnabled(True)
 
     def set_current_model(self, model_name: str):
-        for i in range(self.model_combo.count()):
-            if self.model_combo.itemText(i).startswith(model_name):
-                self.model_combo.setCurrentIndex(i)
-                break
+        """Show *model_name* as selected without emitting model_changed."""
+        idx = self._model_index.get(model_name)
+        if idx is not None:
+            self.model_combo.blockSignals(True)
+            self.model_combo.setCurrentIndex(idx)
+            self.model_combo.blockSignals(False)
 
     def set_conversations(self, conversations: list[dict]):
-        self.history_list.blockSignals(True)
-        self.history_list.clear()
-        for conv in conversations:
-            title = conv.get("title", "New Chat")
-            updated = conv.get("updated_at", "")[:10]
-            item = QListWidgetItem(f"{title}\n{updated}")
-            item.setData(Qt.UserRole, conv["id"])
-            self.history_list.addItem(item)
-        self.history_list.blockSignals(False)
+        # Removing or moving the current row must not reopen a conversation
+        # A diff can be many inserts, moves and removals; paint only the result
+        selection = self.history_list.selectionModel()
+        self.history_list.setUpdatesEnabled(False)
+        selection.blockSignals(True)
+        try:
+            self.history_model.set_rows(conversations)
+        finally:
+            selection.blockSignals(False)
+            self.history_list.setUpdatesEnabled(True)
+
+    def upsert_conversation(self, conv: dict):
+        """
+        Update one conversation's row and move it to the top (it was just
+        touched, so it is the most recent), inserting it if it is new.
+        """
+        selection = self.history_list.selectionModel()
+        selection.blockSignals(True)
+        self.history_model.upsert(conv)
+        selection.blockSignals(False)
+
+    def remove_conversation(self, conv_id: str):
+        selection = self.history_list.selectionModel()
+        selection.blockSignals(True)
+        self.history_model.remove(conv_id)
+        selection.blockSignals(False)
 
     def select_conversation(self, conv_id: str):
-        for i in range(self.history_list.count()):
-            item = self.history_list.item(i)
-            if item.data(Qt.UserRole) == conv_id:
-                self.history_list.setCurrentItem(item)
-                break
+        """Highlight a row without re-emitting conversation_selected."""
+        row = self.history_model.row_of(conv_id)
+        if row < 0:
+            return
+        selection = self.history_list.selectionModel()
+        if selection.currentIndex().row() == row and selection.isRowSelected(row, QModelIndex()):
+            return  # already highlighted, e.g. after every reply in the open chat
+        selection.blockSignals(True)
+        self.history_list.setCurrentIndex(self.history_model.index(row))
+        selection.blockSignals(False)
+
+    def clear_selection(self):
+        """Drop the highlight and current row, so any row can be clicked again."""
+        selection = self.history_list.selectionModel()
+        selection.blockSignals(True)
+        selection.clearCurrentIndex()
+        selection.clearSelection()
+        selection.blockSignals(False)
+        self.history_list.viewport().update()
 
     def update_memory_stats(self, count: int):
+        # Called after every memory write; an unchanged count needs no relayout
+        if count == self._memory_count:
+            return
+        self._memory_count = count
         self.memory_label.setText(f"Memory: {count} entries")
+
+    def set_memory_status(self, text: str):
+        """Show a status instead of a count; the next update_memory_stats replaces it."""
+        self._memory_count = None
+        self.memory_label.setText(f"Memory: {text}")